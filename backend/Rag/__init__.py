@@ -1,51 +1,448 @@
+import hashlib
+import json
 import os
+import shutil
+import tempfile
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional, Sequence, Set
 import numpy as np
-import faiss
-from sentence_transformers import SentenceTransformer
-from PyPDF2 import PdfReader
+
+from .hashing import file_hash
+from .store import CORPUS_FILE, StoreWriter, default_cache_dir, load_artifacts, manifest_matches, read_manifest
+from .tenants import TenantRegistry
+from .index_backends import IndexConfig, VectorIndex
+from .chunking import Chunk, Chunker, get_chunker
+from .extraction import batched, iter_pages
+from .embedding_cache import CachedEncoder
+from .encoders import MODEL_NAME, get_encoder
+from .coalescer import QueryCoalescer
+from .lexical import FUSION_DEPTH, RARE_TERM_IDF, BM25Index, reciprocal_rank_fusion, tokenize
+from .locks import ReadWriteLock
+
+def chunk_id(text: str) -> int:
+    """Stable 63-bit FAISS id derived from the chunk text, so equal chunks share one vector."""
+    digest = hashlib.sha256(text.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'little') & 0x7FFFFFFFFFFFFFFF
 
 class RAGSystem:
-    def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.chunks: List[str] = []
-        self.index: Optional[faiss.IndexFlatL2] = None
-        
+    def __init__(self, cache_dir: Optional[str] = None, model: Optional[CachedEncoder] = None,
+                 index_config: Optional[IndexConfig] = None, chunker: Optional[Chunker] = None,
+                 source_dir: Optional[Path] = None):
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        # Where added PDFs are kept by content hash, when their uploads are
+        # deleted after ingestion, so stores can be rebuilt if parameters change
+        self.source_dir = Path(source_dir) if source_dir else None
+        # Tenants share one encoder (and its embedding cache); only their indexes are per-instance
+        # The encoder itself loads lazily, on the first cache miss
+        if model is None:
+            model = get_encoder()
+        if not isinstance(model, CachedEncoder):
+            model = CachedEncoder.from_env(model, getattr(model, 'name', MODEL_NAME), self.cache_dir)
+        self.model = model
+        self.index_config = index_config or IndexConfig.from_env()
+        self.chunker = chunker or get_chunker()
+        # Chunks per extract -> encode -> index step; bounds ingestion memory
+        self.embed_batch_size = int(os.environ.get('RAG_EMBED_BATCH', 256))
+        # 'hybrid' fuses BM25 with vector search; 'dense' is vector search only
+        self.retrieval_mode = os.environ.get('RAG_RETRIEVAL', 'hybrid')
+        # Searches read the corpus while uploads change it (on other threads);
+        # every mutation holds the write side, every search the read side
+        self.lock = ReadWriteLock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock.write():
+            # chunk id -> chunk (text plus page/offsets); ids are the FAISS ids in self.index
+            self.chunks: Dict[int, Chunk] = {}
+            self.index: Optional[VectorIndex] = None
+            # doc_id (source content hash) -> ids of its chunks
+            self.documents: Dict[str, Set[int]] = {}
+            # How many loaded documents reference each chunk id
+            self.refcounts: Dict[int, int] = {}
+            self.lexical = BM25Index()
+
+    def _cache_key(self) -> dict:
+        # Anything that changes the stored vectors must be part of the key
+        return dict(self.chunker.params(), **self.model.params())
+
+    def _open_document(self, doc_id: str):
+        store_dir = self.cache_dir / doc_id
+        expected = dict(self._cache_key(), source_hash=doc_id)
+        if manifest_matches(read_manifest(store_dir), expected):
+            try:
+                vectors, chunks, _ = load_artifacts(store_dir)
+                return vectors, chunks
+            except (OSError, ValueError, RuntimeError) as e:
+                print(f"Ignoring unreadable RAG cache at {store_dir}: {e}")
+        return None
+
+    def _embed_batch(self, chunks: List[Chunk]) -> np.ndarray:
+        # Vectors always come from the encoder, whose cache answers chunks the
+        # corpus has already seen (repeated headers/footers) without the model.
+        # The index is never read back: ivf_pq only holds lossy reconstructions,
+        # and those would be written into this document's store
+        return self.model.encode([chunk.text for chunk in chunks])
+
+    def _embed_document(self, pdf_path: str, doc_id: str) -> None:
+        self._embed_chunks(doc_id, self.chunker.split(iter_pages(pdf_path)), str(pdf_path))
+
+    def _embed_chunks(self, doc_id: str, chunks: Iterator[Chunk], source: str) -> None:
+        # Pages stream through chunking and encoding in bounded batches; each
+        # batch goes straight into the corpus index and the per-document store
+        # (which holds every chunk, so other corpora can reuse it)
+        store = self._store_writer(doc_id)
+        count = 0
+        try:
+            for batch in batched(chunks, self.embed_batch_size):
+                embeddings = self._embed_batch(batch)
+                self._add(doc_id, batch, embeddings)
+                count += len(batch)
+                if store is not None:
+                    try:
+                        store.append(batch, embeddings)
+                    except OSError as e:
+                        print(f"Error saving RAG cache: {e}")
+                        store.abort()
+                        store = None
+            if not count:
+                raise ValueError(f"No text could be extracted from {source}")
+        except Exception:
+            if store is not None:
+                store.abort()
+            self.remove_document(doc_id)
+            raise
+
+        if store is not None:
+            try:
+                store.commit(dict(self._cache_key(), source_hash=doc_id, source=source))
+            except Exception as e:
+                # A failed cache write must never block serving
+                print(f"Error saving RAG cache: {e}")
+
+    def _rebuild_document(self, doc_id: str) -> None:
+        """Re-embed a document whose store is missing or was written with other parameters."""
+        source = self.source_dir / f"{doc_id}.pdf" if self.source_dir else None
+        if source is not None and source.exists():
+            self._embed_document(str(source), doc_id)
+            return
+        # Without the PDF, the stored chunk text is re-encoded as it was chunked
+        _, chunks, manifest = load_artifacts(self.cache_dir / doc_id)
+        self._embed_chunks(doc_id, iter(chunks), manifest.get("source", doc_id))
+
+    def _keep_source(self, pdf_path: str, doc_id: str) -> None:
+        target = self.source_dir / f"{doc_id}.pdf"
+        if target.exists():
+            return
+        try:
+            self.source_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.source_dir)
+            os.close(fd)
+            shutil.copyfile(pdf_path, tmp_path)
+            os.replace(tmp_path, target)
+        except OSError as e:
+            print(f"Error keeping source PDF for document {doc_id}: {e}")
+
+    def _store_writer(self, doc_id: str) -> Optional[StoreWriter]:
+        try:
+            return StoreWriter(self.cache_dir / doc_id)
+        except OSError as e:
+            print(f"Error saving RAG cache: {e}")
+            return None
+
+    def _add(self, doc_id: str, chunks: Sequence[Chunk], embeddings: Optional[np.ndarray]) -> None:
+        """Add one batch of a document's chunks; may be called repeatedly per document.
+
+        Without ``embeddings`` the chunks' vectors are already in a restored index.
+        """
+        with self.lock.write():
+            if self.index is None:
+                self.index = VectorIndex(embeddings.shape[1], self.index_config)
+
+            doc_chunk_ids = self.documents.setdefault(doc_id, set())
+            new_ids, new_rows = [], []
+            for position, chunk in enumerate(chunks):
+                cid = chunk_id(chunk.text)
+                if cid in doc_chunk_ids:
+                    continue
+                doc_chunk_ids.add(cid)
+                if cid not in self.chunks:
+                    self.chunks[cid] = chunk
+                    self.lexical.add(cid, chunk.text)
+                    new_ids.append(cid)
+                    new_rows.append(position)
+                self.refcounts[cid] = self.refcounts.get(cid, 0) + 1
+
+            if new_ids and embeddings is not None:
+                self.index.add(embeddings[new_rows], np.array(new_ids, dtype=np.int64))
+
+    def _add_cached(self, doc_id: str, vectors: np.ndarray, chunks: Sequence[Chunk]) -> None:
+        for start in range(0, len(vectors), self.embed_batch_size):
+            stop = min(start + self.embed_batch_size, len(vectors))
+            self._add(doc_id, chunks[start:stop], np.array(vectors[start:stop]))
+
+    def add_documents(self, pdf_paths: Iterable[str]) -> List[str]:
+        """Append PDFs to the corpus, embedding only chunks not already indexed.
+
+        Returns the doc_ids that were added (documents already present are skipped).
+        """
+        added = []
+        for pdf_path in pdf_paths:
+            doc_id = file_hash(pdf_path)
+            if doc_id in self.documents:
+                continue
+            self._add_pdf(pdf_path, doc_id)
+            added.append(doc_id)
+        return added
+
+    def _add_pdf(self, pdf_path: str, doc_id: str) -> None:
+        cached = self._open_document(doc_id)
+        if cached:
+            self._add_cached(doc_id, *cached)
+        else:
+            self._embed_document(pdf_path, doc_id)
+        if self.source_dir is not None:
+            self._keep_source(pdf_path, doc_id)
+
+    def remove_document(self, doc_id: str) -> bool:
+        """Drop a document; vectors still referenced by other documents are kept."""
+        with self.lock.write():
+            doc_chunk_ids = self.documents.pop(doc_id, None)
+            if doc_chunk_ids is None:
+                return False
+
+            orphaned = []
+            for cid in doc_chunk_ids:
+                self.refcounts[cid] -= 1
+                if self.refcounts[cid] == 0:
+                    del self.refcounts[cid]
+                    self.lexical.remove(cid, self.chunks.pop(cid).text)
+                    orphaned.append(cid)
+            if orphaned:
+                self.index.remove(orphaned)
+            return True
+
     def load_pdf(self, pdf_path: str) -> bool:
+        return self.load_pdfs([pdf_path])
+
+    def load_pdfs(self, pdf_paths: Iterable[str]) -> bool:
         try:
-            reader = PdfReader(pdf_path)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text()
-            
-            # Create chunks of reasonable size
-            self.chunks = [text[i:i+512] for i in range(0, len(text), 512)]
-            
-            # Create embeddings
-            embeddings = self.model.encode(self.chunks)
-            
-            # Initialize FAISS index
-            dimension = embeddings.shape[1]
-            self.index = faiss.IndexFlatL2(dimension)
-            self.index.add(embeddings)
-            
+            pdf_paths = list(pdf_paths)
+            doc_ids = [file_hash(p) for p in pdf_paths]
+            # The index for this exact set of PDFs is kept under its own key
+            corpus = hashlib.sha256("\n".join(sorted(set(doc_ids))).encode("utf-8")).hexdigest()[:32]
+            index_dir = self.cache_dir / "corpora" / corpus
+            if self._restore_index(index_dir, doc_ids):
+                return True
+            self.reset()
+            for pdf_path, doc_id in zip(pdf_paths, doc_ids):
+                if doc_id not in self.documents:
+                    self._add_pdf(pdf_path, doc_id)
+            self.save_index(index_dir)
             return True
         except Exception as e:
             print(f"Error loading PDF: {e}")
             return False
-    
-    def get_relevant_chunks(self, query: str, k: int = 3) -> List[str]:
-        if not self.index or not self.chunks:
-            return []
-            
-        query_vector = self.model.encode([query])
-        D, I = self.index.search(query_vector, k)
-        
-        return [self.chunks[i] for i in I[0]]
+
+    def load_documents(self, doc_ids: Iterable[str], index_dir: Optional[Path] = None) -> List[str]:
+        """Rebuild the corpus from cached documents; returns the doc_ids that loaded.
+
+        With ``index_dir``, an index saved there by ``save_index`` for the same
+        documents is read back instead of being rebuilt (and retrained); a
+        rebuilt index is saved there for next time.
+
+        A document whose store no longer matches the current parameters is
+        re-embedded from its kept source PDF, or else from its stored chunk
+        text. One that cannot be recovered is logged and skipped.
+        """
+        doc_ids = list(doc_ids)
+        if index_dir is not None and self._restore_index(index_dir, doc_ids):
+            return doc_ids
+        self.reset()
+        loaded = []
+        for doc_id in doc_ids:
+            try:
+                opened = self._open_document(doc_id)
+                if opened:
+                    self._add_cached(doc_id, *opened)
+                else:
+                    print(f"Re-embedding RAG document {doc_id}: cache missing or stale")
+                    self._rebuild_document(doc_id)
+            except Exception as e:
+                print(f"Skipping RAG document {doc_id}: {e}")
+                self.remove_document(doc_id)
+                continue
+            loaded.append(doc_id)
+        if index_dir is not None:
+            self.save_index(index_dir)
+        return loaded
+
+    def _index_manifest(self, doc_ids: Iterable[str]) -> dict:
+        # Compared against the saved copy, so normalized by a JSON round trip
+        return json.loads(json.dumps({
+            "documents": sorted(set(doc_ids)),
+            "cache_key": self._cache_key(),
+            "index_config": vars(self.index_config),
+        }))
+
+    def save_index(self, directory: Path) -> bool:
+        """Serialize the corpus index with FAISS, for ``load_documents``/``load_pdfs``."""
+        directory = Path(directory)
+        staging = None
+        try:
+            directory.parent.mkdir(parents=True, exist_ok=True)
+            staging = Path(tempfile.mkdtemp(prefix=directory.name + ".", dir=directory.parent))
+            with self.lock.read():
+                if self.index is None:
+                    return False
+                self.index.write(staging)
+                manifest = self._index_manifest(self.documents)
+            with open(staging / CORPUS_FILE, "w") as f:
+                json.dump(manifest, f, indent=2)
+            shutil.rmtree(directory, ignore_errors=True)
+            os.replace(staging, directory)
+            return True
+        except Exception as e:
+            # A failed cache write must never block serving
+            print(f"Error saving RAG index: {e}")
+            return False
+        finally:
+            if staging is not None and staging.exists():
+                shutil.rmtree(staging, ignore_errors=True)
+
+    def _restore_index(self, directory: Path, doc_ids: List[str]) -> bool:
+        """Load ``doc_ids`` with the index saved in ``directory``, if it still matches them."""
+        directory = Path(directory)
+        try:
+            with open(directory / CORPUS_FILE) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if saved != self._index_manifest(doc_ids):
+            return False
+
+        opened = []
+        for doc_id in dict.fromkeys(doc_ids):
+            cached = self._open_document(doc_id)
+            if not cached:
+                return False
+            opened.append((doc_id, cached[1]))
+        try:
+            index = VectorIndex.read(directory, self.index_config)
+        except (OSError, ValueError, KeyError, RuntimeError) as e:
+            print(f"Ignoring unreadable RAG index at {directory}: {e}")
+            return False
+
+        self.reset()
+        with self.lock.write():
+            self.index = index
+        # Only chunk metadata and BM25 are rebuilt; the vectors stay in the index
+        for doc_id, chunks in opened:
+            for start in range(0, len(chunks), self.embed_batch_size):
+                self._add(doc_id, chunks[start:start + self.embed_batch_size], None)
+        if len(self.index) != len(self.chunks):
+            print(f"Ignoring inconsistent RAG index at {directory}")
+            self.reset()
+            return False
+        return True
+
+    def _allowed(self, doc_ids: Optional[Iterable[str]]) -> Optional[Set[int]]:
+        # Caller holds the read lock
+        if doc_ids is None:
+            return None
+        return {cid for d in doc_ids for cid in self.documents.get(d, ())}
+
+    def search_vectors(self, query_vectors: np.ndarray, k: int = 3,
+                       doc_ids: Optional[Iterable[str]] = None) -> List[List[Tuple[Chunk, float]]]:
+        """One multi-row index search for already encoded queries."""
+        empty = [[] for _ in range(len(query_vectors))]
+        with self.lock.read():
+            if self.index is None or not self.chunks:
+                return empty
+
+            allowed = self._allowed(doc_ids)
+            if allowed is not None and not allowed:
+                return empty
+
+            D, I = self.index.search(query_vectors, k, allowed_ids=allowed)
+            return [[(self.chunks[i], float(d)) for d, i in zip(row_d, row_i) if i >= 0]
+                    for row_d, row_i in zip(D, I)]
+
+    def search_batch(self, queries: List[str], k: int = 3,
+                     doc_ids: Optional[Iterable[str]] = None) -> List[List[Tuple[Chunk, float]]]:
+        if self.index is None or not self.chunks:
+            return [[] for _ in queries]
+        return self.search_vectors(self.model.encode(queries), k, doc_ids)
+
+    def search(self, query: str, k: int = 3, doc_ids: Optional[Iterable[str]] = None) -> List[Tuple[Chunk, float]]:
+        """Top-k chunks with their page/offset metadata and L2 distance."""
+        return self.search_batch([query], k, doc_ids)[0]
+
+    def lexical_lookup(self, query: str, k: int = 3,
+                       doc_ids: Optional[Iterable[str]] = None) -> Tuple[List[Tuple[Chunk, float]], bool]:
+        """BM25 hits for a query, and whether they are confident enough to skip the encoder.
+
+        Confident means the query names something specific (a number, date or
+        rare word such as a merchant), every such term occurs in the corpus,
+        and the best chunk contains all of them.
+        """
+        with self.lock.read():
+            allowed = self._allowed(doc_ids)
+            if allowed is not None and not allowed:
+                return [], True
+            hits = self.lexical.search(query, max(k, FUSION_DEPTH), allowed)
+
+            terms = set(tokenize(query))
+            known = [t for t in terms if t in self.lexical.postings]
+            numbers = [t for t in terms if t[0].isdigit()]
+            exact = set(numbers) | {t for t in known if self.lexical.idf(t) >= RARE_TERM_IDF}
+            confident = (bool(hits) and bool(exact) and len(known) * 2 >= len(terms)
+                         and all(t in self.lexical.postings for t in numbers)
+                         and self.lexical.covers(hits[0][0], exact))
+            return [(self.chunks[cid], score) for cid, score in hits], confident
+
+    def fuse(self, lexical_hits: List[Tuple[Chunk, float]], dense_hits: List[Tuple[Chunk, float]],
+             k: int) -> List[Tuple[Chunk, float]]:
+        """Reciprocal rank fusion; the returned float is the fused score (higher is better)."""
+        return reciprocal_rank_fusion([[c for c, _ in lexical_hits], [c for c, _ in dense_hits]], k)
+
+    def retrieve_batch(self, queries: List[str], k: int = 3,
+                       doc_ids: Optional[Iterable[str]] = None) -> List[List[Tuple[Chunk, float]]]:
+        """Retrieval as configured by retrieval_mode; only non-confident queries are encoded."""
+        if self.retrieval_mode != 'hybrid':
+            return self.search_batch(queries, k, doc_ids)
+
+        results: List[Optional[List[Tuple[Chunk, float]]]] = [None] * len(queries)
+        lexical = []
+        pending = []
+        for row, query in enumerate(queries):
+            hits, confident = self.lexical_lookup(query, k, doc_ids)
+            lexical.append(hits)
+            if confident:
+                results[row] = hits[:k]
+            else:
+                pending.append(row)
+        if pending:
+            dense = self.search_batch([queries[row] for row in pending], max(k, FUSION_DEPTH), doc_ids)
+            for row, dense_hits in zip(pending, dense):
+                results[row] = self.fuse(lexical[row], dense_hits, k)
+        return results
+
+    def get_relevant_chunks(self, query: str, k: int = 3, doc_ids: Optional[Iterable[str]] = None) -> List[str]:
+        return [chunk.text for chunk, _ in self.retrieve_batch([query], k, doc_ids)[0]]
 
     def format_context(self, chunks: List[str]) -> str:
         return "\n\n".join([f"Chunk {i+1}:\n{chunk}" for i, chunk in enumerate(chunks)])
 
 # Initialize global RAG system
 rag_system = RAGSystem()
+
+# Per-user corpora share the global encoder
+tenant_registry = TenantRegistry(
+    lambda: RAGSystem(cache_dir=rag_system.cache_dir, model=rag_system.model,
+                      index_config=rag_system.index_config, source_dir=rag_system.cache_dir / "sources"),
+    rag_system.cache_dir / "tenants",
+    max_tenants=int(os.environ.get('RAG_MAX_TENANTS', 32)),
+)
+
+# Batches concurrent /chat retrievals into shared encode + search calls
+query_coalescer = QueryCoalescer.from_env(rag_system.model)
@@ -1,21 +1,61 @@
-from flask import Flask, request, jsonify, render_template
-from groq import Groq
+from flask import Flask, Response, request, jsonify, render_template
 from datetime import datetime
 from dotenv import load_dotenv
 import os
 import warnings
 import pandas as pd
-import matplotlib.pyplot as plt
-import io
-import base64
 from pathlib import Path
 import json
 import tempfile
 import threading
 import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from categorizer import CATEGORIES, CategoryCache, TransactionCategorizer, default_cache_path, parse_indexed_labels
+from ratelimit import RateLimiter, estimate_tokens
+from hashing import file_hash
+from sessions import SessionStore, UploadSession
+from table_cache import TableCache
+from aggregates import FinancialMetrics, RunningTotals
+from normalize import normalize_transactions, signed_amounts
+from charts import FORMATS as CHART_FORMATS, ChartService, available_charts
+from jobs import DONE, FAILED, JobQueue
+
+# The LLM gateway and endpoint helpers are shared with the chat apps one directory up
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from llm_gateway import get_gateway
+from endpoints import LLMCall, Reply, complete, endpoint
+from streaming import wants_stream
 
 load_dotenv()
 
+# Parallel categorization requests per upload, and the prompt size per request
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 4))
+LLM_BATCH_CHARS = int(os.environ.get('LLM_BATCH_CHARS', 1500))
+LLM_BATCH_MAX_ITEMS = int(os.environ.get('LLM_BATCH_MAX_ITEMS', 50))
+# Follow-up requests for rows the model skipped or mislabeled
+LLM_REPAIR_ATTEMPTS = int(os.environ.get('LLM_REPAIR_ATTEMPTS', 2))
+# Shared by every advisor instance so concurrent uploads stay inside the provider quota
+llm_rate_limiter = RateLimiter.from_env()
+# Merchant categories learned from every upload; one SQLite connection per process
+category_cache = CategoryCache(default_cache_path())
+# Processed uploads reused by /api/advice and /api/question
+upload_sessions = SessionStore.from_env()
+# CSV files above this size are streamed in chunks rather than loaded whole
+STREAM_THRESHOLD_BYTES = int(float(os.environ.get('STREAM_THRESHOLD_MB', 50)) * 1024 * 1024)
+STREAM_CHUNK_ROWS = int(os.environ.get('STREAM_CHUNK_ROWS', 50000))
+# Categorized tables of previously seen files, by content hash
+table_cache = TableCache()
+# Charts render lazily and are cached per dataset, type, format and size
+chart_service = ChartService.from_env()
+# Upload processing runs here, off the request threads
+upload_jobs = JobQueue.from_env()
+# Spoken answers stop generating at this many words
+ANSWER_MAX_WORDS = int(os.environ.get('ANSWER_MAX_WORDS', 50))
+ADVICE_HEADER = "💡 Personal Financial Advice:\n\n"
+
 app = Flask(__name__)
 
 class FinancialAdvisor:
@@ -26,47 +66,162 @@ class FinancialAdvisor:
         if not self.groq_api_key:
             raise ValueError("Groq API key must be provided in the GROQ_API_KEY environment variable.")
             
-        self.client = Groq(api_key=self.groq_api_key)
+        # Shared across advisor instances, so requests reuse one connection pool
+        self.llm = get_gateway(self.groq_api_key)
         self.transaction_data = None
         self.categorized_data = None
         self.detected_format = {}
         self.current_file_path = None
-        self.charts = {}
+        self.summary = None
+        self.metrics = None
+        # Only the stats and LLM callback are per-upload; the cache is shared
+        self.categorizer = TransactionCategorizer(self._llm_categorize, category_cache)
+        # Per-upload LLM usage; a wasted call is one that yielded no usable label
+        self.llm_metrics = {'calls': 0, 'repair_calls': 0, 'wasted_calls': 0, 'labels': 0,
+                            'batches': 0, 'batches_done': 0}
+        self._metrics_lock = threading.Lock()
+        # Optional callback(**progress) used by the background upload jobs
+        self.on_progress = None
+
+    def _report(self, **progress):
+        """Forward progress to whoever is watching this upload"""
+        if self.on_progress is not None:
+            self.on_progress(**progress)
     
-    def process_transaction_data(self, file_path):
-        """Process transaction data from CSV/Excel files"""
+    def process_transaction_data(self, file_path, digest=None):
+        """Process transaction data from CSV/Excel files; ``digest`` is the file's hash if already known"""
         try:
             # Determine file type
             file_extension = Path(file_path).suffix.lower()
-            
-            if file_extension == '.csv':
-                df = pd.read_csv(file_path)
-            elif file_extension in ['.xlsx', '.xls']:
-                df = pd.read_excel(file_path)
-            else:
+            if file_extension not in ['.csv', '.xlsx', '.xls']:
                 return "Unsupported file format. Please upload CSV or Excel files."
-                
-            # Store the dataframe and file path
-            self.transaction_data = df
+
+            # Large CSV exports are aggregated chunk by chunk instead of loaded whole
+            if file_extension == '.csv' and os.path.getsize(file_path) > STREAM_THRESHOLD_BYTES:
+                return self.process_transaction_stream(file_path)
+
+            # A file seen before loads its categorized table from the Parquet cache
+            digest = digest or file_hash(file_path)
+            cached = table_cache.load(digest)
+            if cached is not None:
+                df, self.detected_format = cached
+                self.transaction_data = df
+                self.categorized_data = df
+                self._report(stage='loaded_from_cache', rows_parsed=len(df))
+            else:
+                if file_extension == '.csv':
+                    df = pd.read_csv(file_path)
+                else:
+                    df = pd.read_excel(file_path)
+                self._report(stage='parsed', rows_parsed=len(df))
+
+                # Try to automatically detect columns
+                self.detected_format = self._detect_transaction_format(df)
+
+                # Parse amounts and dates once; everything downstream reads typed columns
+                df, self.detected_format = normalize_transactions(df, self.detected_format)
+
+                # Store the dataframe
+                self.transaction_data = df
+
+                # Process and categorize transactions
+                self._categorize_transactions()
+                # Don't pin a table with labels the LLM never produced; failed
+                # calls whose rows were recovered by a repair attempt are fine
+                if not self.categorizer.stats['unresolved']:
+                    table_cache.save(digest, self._normalized_table(), self.detected_format)
             self.current_file_path = file_path
-            
-            # Try to automatically detect columns
-            self.detected_format = self._detect_transaction_format(df)
-            
-            # Process and categorize transactions
-            self._categorize_transactions()
+
+            # One aggregation pass feeds the summary, charts and advice
+            self.metrics = FinancialMetrics.from_frame(self.categorized_data, self.detected_format.get('amount_column'),
+                                                       self.detected_format.get('date_column'))
+            self._report(stage='aggregated')
             
             # Generate transaction summary
             summary = self._generate_transaction_summary()
+            self.summary = summary
             
-            # Generate visualization
-            self._generate_visualizations()
-            
+            # Charts are rendered on request by the chart service
             return f"✅ Successfully processed transaction data with {len(df)} entries.\n\n{summary}"
             
         except Exception as e:
             return f"❌ Error processing transaction data: {str(e)}"
 
+    def process_transaction_stream(self, file_path, chunk_rows=None):
+        """Categorize and aggregate a CSV in fixed-size chunks, keeping only running totals"""
+        chunk_rows = chunk_rows or STREAM_CHUNK_ROWS
+        try:
+            start = time.perf_counter()
+            self.current_file_path = file_path
+            self.transaction_data = None
+            self.categorized_data = None
+            self.metrics = None
+            self.llm_metrics = dict.fromkeys(self.llm_metrics, 0)
+
+            # Detect columns from the head of the file only
+            self.detected_format = self._detect_transaction_format(pd.read_csv(file_path, nrows=100))
+            amount_col = self.detected_format.get('amount_column')
+            date_col = self.detected_format.get('date_column')
+            desc_col = self.detected_format.get('description_column')
+
+            totals = RunningTotals()
+            for chunk in pd.read_csv(file_path, chunksize=chunk_rows):
+                if not amount_col:
+                    totals.rows += len(chunk)
+                    continue
+                amounts = signed_amounts(chunk, self.detected_format)
+
+                categories = chunk['category'] if 'category' in chunk.columns else pd.Series('Uncategorized', index=chunk.index)
+                if desc_col:
+                    # The merchant cache carries labels across chunks, so each merchant hits the LLM once
+                    labels = self.categorizer.categorize(chunk[desc_col].astype(str).tolist())
+                    categories = pd.Series([label or current for label, current in zip(labels, categories)], index=chunk.index)
+
+                months = None
+                if date_col:
+                    months = pd.to_datetime(chunk[date_col], errors='coerce').dt.strftime('%Y-%m')
+
+                totals.update(amounts, categories, months)
+                self._report(stage='streaming', rows_parsed=totals.rows, categorization=dict(self.categorizer.stats))
+
+            elapsed = time.perf_counter() - start
+            self.metrics = FinancialMetrics.from_totals(totals)
+            self.summary = self._generate_transaction_summary()
+            rate = totals.rows / elapsed if elapsed > 0 else 0.0
+
+            return (f"✅ Successfully processed transaction data with {totals.rows} entries "
+                    f"({rate:.0f} rows/sec).\n\n{self.summary}")
+
+        except Exception as e:
+            return f"❌ Error processing transaction data: {str(e)}"
+
+    def to_session(self, upload_id, digest, message):
+        """Snapshot the processed state for reuse by later requests"""
+        return UploadSession(upload_id=upload_id, content_hash=digest, data=self.categorized_data,
+                             detected_format=self.detected_format, metrics=self.metrics, summary=self.summary,
+                             message=message, llm_metrics=dict(self.llm_metrics),
+                             categorization=dict(self.categorizer.stats), created=time.time())
+
+    def restore_session(self, session):
+        """Adopt a processed upload without re-reading or re-categorizing the file"""
+        self.transaction_data = session.data
+        self.categorized_data = session.data
+        self.detected_format = session.detected_format
+        self.metrics = session.metrics
+        self.summary = session.summary
+
+    def _normalized_table(self):
+        """The columns later steps read, with descriptions (and unparsed dates) as text"""
+        df = self.categorized_data
+        fmt = self.detected_format
+        columns = [c for c in (fmt.get('date_column'), fmt.get('amount_column'), fmt.get('description_column'))
+                   if c is not None]
+        table = df[list(dict.fromkeys(columns)) + ['category']].copy()
+        for column in (fmt.get('date_column'), fmt.get('description_column')):
+            if column and column != fmt.get('amount_column') and table[column].dtype == object:
+                table[column] = table[column].astype(str)
+        return table
+
     def _detect_transaction_format(self, df):
         """Detect transaction data format automatically"""
         columns = [col.lower() for col in df.columns]
@@ -81,15 +236,23 @@ class FinancialAdvisor:
                 break
         
         # Look for amount column
-        amount_candidates = ['amount', 'transaction amount', 'debit', 'credit']
+        amount_candidates = ['amount', 'transaction amount', 'amt', 'debit', 'credit', 'withdrawal', 'deposit']
         for candidate in amount_candidates:
             matches = [col for col in columns if candidate in col]
             if matches:
                 format_info['amount_column'] = df.columns[columns.index(matches[0])]
                 break
+
+        # Split exports carry outflows and inflows in separate columns
+        debits = [col for col in columns if 'debit' in col or 'withdrawal' in col]
+        credits = [col for col in columns if 'credit' in col or 'deposit' in col]
+        if debits and credits and debits[0] != credits[0] and \
+                format_info.get('amount_column') in (df.columns[columns.index(debits[0])], df.columns[columns.index(credits[0])]):
+            format_info['debit_column'] = df.columns[columns.index(debits[0])]
+            format_info['credit_column'] = df.columns[columns.index(credits[0])]
         
         # Look for description column
-        desc_candidates = ['description', 'narrative', 'details', 'transaction description', 'merchant']
+        desc_candidates = ['description', 'narrative', 'narration', 'particulars', 'details', 'transaction description', 'merchant']
         for candidate in desc_candidates:
             matches = [col for col in columns if candidate in col]
             if matches:
@@ -102,287 +265,222 @@ class FinancialAdvisor:
         """Categorize transactions based on description"""
         if not hasattr(self, 'transaction_data') or self.transaction_data is None:
             return
-            
-        # Create a copy of the dataframe
-        df = self.transaction_data.copy()
+
+        self.llm_metrics = dict.fromkeys(self.llm_metrics, 0)
+        self._report(stage='categorizing')
+
+        # The ingested frame is already private to this advisor, so label it in place
+        df = self.transaction_data
         
         # Add category column if it doesn't exist
         if 'category' not in df.columns:
             df['category'] = 'Uncategorized'
         
-        # Use LLM to categorize transactions in batches
         desc_column = self.detected_format.get('description_column')
         if not desc_column:
             # Cannot categorize without description
+            df['category'] = df['category'].astype('category')
             self.categorized_data = df
             return
-            
-        # Process in batches to avoid context length issues
-        batch_size = 20
-        for i in range(0, len(df), batch_size):
-            batch = df.iloc[i:i+batch_size]
-            descriptions = batch[desc_column].tolist()
-            
-            # Create prompt for categorization
-            prompt = "Categorize each of these transactions into one of the following categories:\n"
-            prompt += "Food, Shopping, Transportation, Housing, Utilities, Healthcare, Entertainment, Travel, Education, Income, Savings, Other\n\n"
-            prompt += "For each transaction, respond with just the category name. Transactions:\n\n"
-            prompt += "\n".join(descriptions)
-            
+
+        # Rules and the merchant cache resolve most rows; only the rest reach the LLM
+        categories = self.categorizer.categorize(df[desc_column].astype(str).tolist())
+        resolved = [category is not None for category in categories]
+        df.loc[resolved, 'category'] = [category for category in categories if category is not None]
+        df['category'] = df['category'].astype('category')
+        self._report(categorization=dict(self.categorizer.stats))
+
+        self.categorized_data = df
+
+    def _plan_batches(self, descriptions):
+        """Split descriptions into batches sized by prompt length rather than row count"""
+        batches = []
+        start, chars = 0, 0
+        for i, description in enumerate(descriptions):
+            if i > start and (chars + len(description) > LLM_BATCH_CHARS or i - start >= LLM_BATCH_MAX_ITEMS):
+                batches.append((start, i))
+                start, chars = i, 0
+            chars += len(description) + 1
+        if start < len(descriptions):
+            batches.append((start, len(descriptions)))
+        return batches
+
+    def _request_labels(self, items, fresh=False):
+        """Send one indexed categorization request, waiting on the shared rate limiter"""
+        prompt = "Categorize each of these transactions into one of the following categories:\n"
+        prompt += ", ".join(CATEGORIES) + "\n\n"
+        prompt += 'Respond with only a JSON object mapping each transaction number to its category, e.g. {"1": "Food", "2": "Income"}. Transactions:\n\n'
+        prompt += "\n".join(f"{n}. {description}" for n, description in enumerate(items, 1))
+
+        # Budget the prompt plus roughly 8 tokens of JSON per row
+        llm_rate_limiter.acquire(estimate_tokens(prompt) + 8 * len(items))
+        content = self.llm.chat(
+            "advisor.categorize",
+            model="llama3-70b-8192",
+            messages=[
+                {"role": "system", "content": "You are a financial transaction categorization expert. Your task is to categorize financial transactions based on their descriptions."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.1,
+            response_format={"type": "json_object"},
+            cache=not fresh
+        )
+        return parse_indexed_labels(content, len(items))
+
+    def _categorize_batch(self, batch):
+        """Categorize one batch, re-requesting only rows whose label was missing or invalid"""
+        labels = [None] * len(batch)
+        pending = list(range(len(batch)))
+        for attempt in range(LLM_REPAIR_ATTEMPTS + 1):
             try:
-                response = self.client.chat.completions.create(
-                    model="llama3-70b-8192",
-                    messages=[
-                        {"role": "system", "content": "You are a financial transaction categorization expert. Your task is to categorize financial transactions based on their descriptions."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.1
-                )
-                
-                # Parse categories from response
-                categories = response.choices[0].message.content.strip().split('\n')
-                
-                # Ensure we have the right number of categories
-                if len(categories) == len(batch):
-                    df.loc[batch.index, 'category'] = categories
+                # A repeat of an unusable reply must not come back from the response cache
+                parsed = self._request_labels([batch[i] for i in pending], fresh=attempt > 0)
             except Exception as e:
                 print(f"Error categorizing transactions: {str(e)}")
-        
-        self.categorized_data = df
+                parsed = {}
+            with self._metrics_lock:
+                self.llm_metrics['calls'] += 1
+                self.llm_metrics['repair_calls'] += attempt > 0
+                self.llm_metrics['wasted_calls'] += not parsed
+                self.llm_metrics['labels'] += len(parsed)
+            for position, category in parsed.items():
+                labels[pending[position]] = category
+            pending = [i for i in pending if labels[i] is None]
+            if not pending:
+                break
+        return labels
+
+    def _llm_categorize(self, descriptions):
+        """Ask the LLM for the category of each description, None where it fails"""
+        categories = [None] * len(descriptions)
+        batches = self._plan_batches(descriptions)
+        if not batches:
+            return categories
+
+        with self._metrics_lock:
+            self.llm_metrics['batches'] += len(batches)
+        self._report(batches_total=self.llm_metrics['batches'], batches_done=self.llm_metrics['batches_done'])
+
+        # Batches run concurrently; results are placed back by position
+        with ThreadPoolExecutor(max_workers=min(LLM_MAX_CONCURRENCY, len(batches))) as pool:
+            futures = {pool.submit(self._categorize_batch, descriptions[start:end]): start
+                       for start, end in batches}
+            for future in as_completed(futures):
+                start = futures[future]
+                answers = future.result()
+                categories[start:start + len(answers)] = answers
+                with self._metrics_lock:
+                    self.llm_metrics['batches_done'] += 1
+                self._report(batches_done=self.llm_metrics['batches_done'])
+
+        with self._metrics_lock:
+            llm_metrics = dict(self.llm_metrics)
+        self._report(llm_metrics=llm_metrics)
+        return categories
 
     def _generate_transaction_summary(self):
         """Generate a summary of transaction data"""
-        if not hasattr(self, 'categorized_data') or self.categorized_data is None:
+        metrics = self.metrics
+        if metrics is None:
             return "No transaction data available."
-            
-        df = self.categorized_data
+
+        if not self.detected_format.get('amount_column'):
+            return f"📊 Transaction Summary:\n\nTotal Transactions: {metrics.rows}\n"
+
+        summary = f"📊 Transaction Summary:\n\n"
+        summary += f"Total Transactions: {metrics.rows}\n"
+        summary += f"Income: ${metrics.income:.2f}\n"
+        summary += f"Expenses: ${metrics.expenses:.2f}\n"
+        summary += f"Net: ${metrics.net:.2f}\n"
+
+        # Category breakdown if we have categories
+        if metrics.category_expenses:
+            summary += "\n🔍 Top Spending Categories:\n"
+            for cat, amount in metrics.category_expenses[:5]:
+                summary += f"- {cat}: ${amount:.2f}\n"
+
+        return summary
+
+    def advice_messages(self):
+        """Chat messages for the advice prompt, or (None, reason) when there is not enough data"""
+        metrics = self.metrics
+        if metrics is None:
+            return None, "No transaction data available for analysis."
+        if not (self.detected_format.get('amount_column') and metrics.category_expenses):
+            return None, "Insufficient transaction data to generate financial advice. Please ensure your data includes amount and category information."
+
+        # Create a context string with financial metrics
+        context = "Based on the user's transaction data:\n\n"
+        context += f"Total income: ${metrics.income:.2f}\n"
+        context += f"Total expenses: ${metrics.expenses:.2f}\n"
+        context += f"Savings rate: {metrics.savings_rate:.1f}%\n\n"
+        context += "Expense breakdown by category:\n"
         
-        # Calculate basic metrics
-        total_records = len(df)
+        for category, amount in metrics.category_expenses:
+            percentage = amount / metrics.expenses * 100
+            context += f"- {category}: ${amount:.2f} ({percentage:.1f}%)\n"
         
-        # Handle amount calculations
-        amount_col = self.detected_format.get('amount_column')
-        if amount_col:
-            # Convert to numeric, handling potential formatting issues
-            df[amount_col] = pd.to_numeric(df[amount_col].astype(str).str.replace(',', '').str.replace('$', ''), errors='coerce')
-            
-            # Calculate income vs. expenses
-            # Assuming positive values are income, negative are expenses (adjust as needed)
-            income = df[df[amount_col] > 0][amount_col].sum()
-            expenses = abs(df[df[amount_col] < 0][amount_col].sum())
-            net = income - expenses
-            
-            # Category breakdown if we have categories
-            if 'category' in df.columns:
-                expense_df = df[df[amount_col] < 0].copy()
-                category_summary = expense_df.groupby('category')[amount_col].sum().sort_values()
-                top_categories = category_summary.head(5)
-                
-                category_breakdown = "\n🔍 Top Spending Categories:\n"
-                for cat, amount in top_categories.items():
-                    category_breakdown += f"- {cat}: ${abs(amount):.2f}\n"
-                
-            else:
-                category_breakdown = ""
-            
-            summary = f"📊 Transaction Summary:\n\n"
-            summary += f"Total Transactions: {total_records}\n"
-            summary += f"Income: ${income:.2f}\n"
-            summary += f"Expenses: ${expenses:.2f}\n"
-            summary += f"Net: ${net:.2f}\n"
-            summary += category_breakdown
-            
-            return summary
-        else:
-            return f"📊 Transaction Summary:\n\nTotal Transactions: {total_records}\n"
+        # Generate advice using the LLM with specific instructions for visually impaired users
+        prompt = context + "\n\nProvide friendly and helpful financial advice based on this spending pattern. The user is visually impaired, so:\n"
+        prompt += "1. Use clear, straightforward language without relying on visual cues\n"
+        prompt += "2. Structure information with clear section headings and numbered lists\n"
+        prompt += "3. Focus on practical, actionable advice that's easy to remember\n"
+        prompt += "4. Suggest accessible financial tools and resources (like screen-reader compatible apps)\n"
+        prompt += "5. Offer concise explanations of financial concepts when introducing them\n\n"
+        prompt += "Focus on identifying areas where the user could save money, suggesting budgeting tips, and offering actionable recommendations. Include advice on improving their savings rate if applicable."
 
-    def _generate_visualizations(self):
-        """Generate visualizations from transaction data"""
-        if not hasattr(self, 'categorized_data') or self.categorized_data is None:
-            return
-            
-        df = self.categorized_data
-        amount_col = self.detected_format.get('amount_column')
-        
-        if not amount_col or 'category' not in df.columns:
-            return
-            
-        try:
-            # Create a spending by category pie chart
-            plt.figure(figsize=(10, 6))
-            expenses = df[df[amount_col] < 0].copy()
-            category_expenses = expenses.groupby('category')[amount_col].sum()
-            
-            # Convert to absolute values and sort
-            abs_expenses = category_expenses.apply(abs).sort_values(ascending=False)
-            
-            # Only show top 6 categories, group the rest as "Other"
-            if len(abs_expenses) > 6:
-                top_cats = abs_expenses.head(6)
-                other_sum = abs_expenses.iloc[6:].sum()
-                
-                if other_sum > 0:
-                    plot_data = pd.concat([top_cats, pd.Series({'Other': other_sum})])
-                else:
-                    plot_data = top_cats
-            else:
-                plot_data = abs_expenses
-                
-            # Create pie chart
-            plt.pie(plot_data, labels=plot_data.index, autopct='%1.1f%%', startangle=90)
-            plt.axis('equal')
-            plt.title('Spending by Category')
-            
-            # Save to a base64 string
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png')
-            buf.seek(0)
-            self.charts['category_pie'] = base64.b64encode(buf.read()).decode('utf-8')
-            plt.close()
-            
-            # Create income vs expenses bar chart if we have date info
-            date_col = self.detected_format.get('date_column')
-            if date_col:
-                # Ensure date column is datetime
-                try:
-                    df[date_col] = pd.to_datetime(df[date_col])
-                    # Add a month column
-                    df['month'] = df[date_col].dt.strftime('%Y-%m')
-                    
-                    # Group by month
-                    monthly_data = df.groupby('month')[amount_col].agg(['sum', 'count'])
-                    
-                    # Split into income and expenses
-                    monthly_income = df[df[amount_col] > 0].groupby('month')[amount_col].sum()
-                    monthly_expenses = df[df[amount_col] < 0].groupby('month')[amount_col].sum().abs()
-                    
-                    # Create the plot
-                    plt.figure(figsize=(12, 6))
-                    
-                    # Get all months from both series
-                    all_months = sorted(list(set(monthly_income.index) | set(monthly_expenses.index)))
-                    
-                    # Create index positions
-                    x = range(len(all_months))
-                    
-                    # Fill in missing months with zeros
-                    income_values = [monthly_income.get(month, 0) for month in all_months]
-                    expense_values = [monthly_expenses.get(month, 0) for month in all_months]
-                    
-                    # Create the plot
-                    width = 0.35
-                    plt.bar([i - width/2 for i in x], income_values, width, label='Income')
-                    plt.bar([i + width/2 for i in x], expense_values, width, label='Expenses')
-                    
-                    plt.xlabel('Month')
-                    plt.ylabel('Amount ($)')
-                    plt.title('Monthly Income vs Expenses')
-                    plt.xticks(x, all_months, rotation=45)
-                    plt.legend()
-                    plt.tight_layout()
-                    
-                    # Save to a base64 string
-                    buf = io.BytesIO()
-                    plt.savefig(buf, format='png')
-                    buf.seek(0)
-                    self.charts['monthly_comparison'] = base64.b64encode(buf.read()).decode('utf-8')
-                    plt.close()
-                except Exception as e:
-                    print(f"Error creating time-based chart: {str(e)}")
-                
-        except Exception as e:
-            print(f"Error generating visualizations: {str(e)}")
+        return [
+            {"role": "system", "content": "You are a friendly, helpful personal financial advisor specializing in accessible financial guidance. Your task is to analyze spending patterns and provide clear, actionable financial advice that works well for visually impaired users. Be supportive, educational, and focus on practical solutions."},
+            {"role": "user", "content": prompt}
+        ], None
+
+    def advice_reply(self, stream=False):
+        """Endpoint reply for financial advice based on transaction data"""
+        messages, reason = self.advice_messages()
+        if messages is None:
+            return Reply({'advice': reason}, text=reason, stream=stream)
+        call = LLMCall(self.llm, "advisor.advice", dict(
+            model="llama3-70b-8192",
+            messages=messages,
+            temperature=0.7,
+            max_tokens=1500
+        ))
+        # The header is streamed first, ahead of the model's tokens
+        return Reply(call=call, done=lambda content: {'advice': ADVICE_HEADER + content.strip()},
+                     prefix=ADVICE_HEADER, stream=stream)
+
+    def question_reply(self, user_input, stream=False):
+        """Endpoint reply for a question; generation stops at ANSWER_MAX_WORDS words"""
+        call = LLMCall(self.llm, "advisor.question", dict(
+            messages=[
+                {"role": "system", "content": "You are a financial advisor using RAG to provide accurate and personalized financial advice."},
+                {"role": "user", "content": user_input}
+            ],
+            model="llama3-70b-8192",
+            temperature=0.7,
+            max_tokens=150
+        ), max_words=ANSWER_MAX_WORDS)
+        return Reply(call=call, done=lambda response: {'answer': self.voice_friendly(response)},
+                     stream=stream, flatten=True)
+
+    @staticmethod
+    def voice_friendly(response):
+        """Format a response for voice output: no line breaks or runs of spaces"""
+        return ' '.join(response.replace('\n', ' ').split())
 
     def generate_financial_advice(self):
         """Generate personalized financial advice based on transaction data"""
-        if not hasattr(self, 'categorized_data') or self.categorized_data is None:
-            return "No transaction data available for analysis."
-        
-        df = self.categorized_data
-        
-        # Prepare context with transaction data
-        amount_col = self.detected_format.get('amount_column')
-        if amount_col and 'category' in df.columns:
-            # Calculate category percentages
-            expenses = df[df[amount_col] < 0].copy()
-            total_expense = abs(expenses[amount_col].sum())
-            
-            # Calculate income
-            income = df[df[amount_col] > 0][amount_col].sum()
-            
-            # Calculate savings rate
-            savings_rate = (income - total_expense) / income * 100 if income > 0 else 0
-            
-            category_expenses = expenses.groupby('category')[amount_col].sum().sort_values()
-            
-            # Create a context string with financial metrics
-            context = "Based on the user's transaction data:\n\n"
-            context += f"Total income: ${income:.2f}\n"
-            context += f"Total expenses: ${total_expense:.2f}\n"
-            context += f"Savings rate: {savings_rate:.1f}%\n\n"
-            context += "Expense breakdown by category:\n"
-            
-            for category, amount in category_expenses.items():
-                percentage = (abs(amount) / total_expense) * 100
-                context += f"- {category}: ${abs(amount):.2f} ({percentage:.1f}%)\n"
-            
-            # Generate advice using the LLM with specific instructions for visually impaired users
-            prompt = context + "\n\nProvide friendly and helpful financial advice based on this spending pattern. The user is visually impaired, so:\n"
-            prompt += "1. Use clear, straightforward language without relying on visual cues\n"
-            prompt += "2. Structure information with clear section headings and numbered lists\n"
-            prompt += "3. Focus on practical, actionable advice that's easy to remember\n"
-            prompt += "4. Suggest accessible financial tools and resources (like screen-reader compatible apps)\n"
-            prompt += "5. Offer concise explanations of financial concepts when introducing them\n\n"
-            prompt += "Focus on identifying areas where the user could save money, suggesting budgeting tips, and offering actionable recommendations. Include advice on improving their savings rate if applicable."
-            
-            try:
-                response = self.client.chat.completions.create(
-                    model="llama3-70b-8192",
-                    messages=[
-                        {"role": "system", "content": "You are a friendly, helpful personal financial advisor specializing in accessible financial guidance. Your task is to analyze spending patterns and provide clear, actionable financial advice that works well for visually impaired users. Be supportive, educational, and focus on practical solutions."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.7,
-                    max_tokens=1500
-                )
-                
-                return "💡 Personal Financial Advice:\n\n" + response.choices[0].message.content.strip()
-            except Exception as e:
-                return f"Error generating financial advice: {str(e)}"
-        else:
-            return "Insufficient transaction data to generate financial advice. Please ensure your data includes amount and category information."
+        try:
+            return complete(self.advice_reply())[0]['advice']
+        except Exception as e:
+            return advice_error(e)[0]['advice']
 
     def get_response(self, user_input):
         """Get response from the RAG system"""
         try:
-            # Process the user input through the RAG system
-            completion = self.client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": "You are a financial advisor using RAG to provide accurate and personalized financial advice."},
-                    {"role": "user", "content": user_input}
-                ],
-                model="llama3-70b-8192",
-                temperature=0.7,
-                max_tokens=150
-            )
-            
-            # Get the response
-            response = completion.choices[0].message.content
-            
-            # Format the response to be voice-friendly
-            # Remove any complex formatting or special characters
-            response = response.replace('\n', ' ').strip()
-            response = ' '.join(response.split())  # Remove extra spaces
-            
-            # Ensure the response is concise and clear for voice output
-            if len(response.split()) > 50:
-                response = ' '.join(response.split()[:50]) + '...'
-            
-            return response
-            
+            return complete(self.question_reply(user_input))[0]['answer']
         except Exception as e:
-            print(f"Error getting RAG response: {str(e)}")
-            return "I apologize, but I'm having trouble processing your financial advice request at the moment. Please try again later."
+            return question_error(e)[0]['answer']
 
 
 # Routes for web interface
@@ -400,49 +498,158 @@ def upload_file():
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
     
-    # Save the file temporarily
-    temp_dir = tempfile.gettempdir()
-    temp_path = os.path.join(temp_dir, file.filename)
+    # Save the file under a unique temporary name so concurrent uploads can't collide
+    fd, temp_path = tempfile.mkstemp(suffix=Path(file.filename).suffix.lower())
+    os.close(fd)
     file.save(temp_path)
-    
-    # Process the file
-    advisor = FinancialAdvisor()
-    result = advisor.process_transaction_data(temp_path)
-    
-    # Return charts if available
-    response_data = {
-        'message': result,
-        'charts': advisor.charts if hasattr(advisor, 'charts') else {}
+
+    # Processing runs on the job workers; the client polls or streams progress
+    job = upload_jobs.submit('upload', lambda job: _run_upload_job(job, temp_path))
+    if request.args.get('wait'):
+        job.wait()
+        if job.status == FAILED:
+            return jsonify({'message': job.error, 'charts': {}})
+        return jsonify(job.result)
+
+    return jsonify({
+        'job_id': job.id,
+        'status_url': f"/api/jobs/{job.id}",
+        'events_url': f"/api/jobs/{job.id}/events"
+    }), 202
+
+def _run_upload_job(job, file_path):
+    # Identical bytes uploaded again reuse the processed session
+    session, result = _process_upload(file_path, progress=job.update)
+    if session is None:
+        raise ValueError(result)
+
+    charts = _chart_urls(session)
+    job.update(stage='done', charts_ready=list(charts))
+    return {
+        'upload_id': session.upload_id,
+        'file_path': file_path,
+        'message': session.message,
+        'charts': charts,
+        'llm_metrics': session.llm_metrics,
+        'categorization': session.categorization
     }
-    
-    return jsonify(response_data)
 
-@app.route('/api/advice', methods=['POST'])
-def get_advice():
-    file_path = request.json.get('file_path')
-    
-    if not file_path or not os.path.exists(file_path):
-        return jsonify({'error': 'Invalid file path'}), 400
-    
+def _job_payload(job):
+    payload = job.snapshot()
+    if job.status == DONE:
+        payload['result'] = job.result
+    return payload
+
+@app.route('/api/llm-stats', methods=['GET'])
+def llm_stats():
+    return jsonify(get_gateway().stats())
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = upload_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job_id'}), 404
+    return jsonify(_job_payload(job))
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def stream_job(job_id):
+    job = upload_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job_id'}), 404
+
+    def events():
+        # Server-sent events: one message per progress change, the last one carries the result
+        for snapshot in job.events():
+            if snapshot['status'] == DONE:
+                snapshot = _job_payload(job)
+            yield f"data: {json.dumps(snapshot)}\n\n"
+
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+def _chart_urls(session):
+    """Links to the charts this upload can render; nothing is drawn until one is fetched"""
+    return {chart: f"/api/charts/{session.upload_id}/{chart}" for chart in available_charts(session.metrics)}
+
+@app.route('/api/charts/<upload_id>/<chart_type>', methods=['GET'])
+def get_chart(upload_id, chart_type):
+    session = upload_sessions.get(upload_id)
+    if session is None:
+        return jsonify({'error': 'Unknown upload_id'}), 404
+    if chart_type not in available_charts(session.metrics):
+        return jsonify({'error': f'Chart not available: {chart_type}'}), 404
+
+    fmt = request.args.get('format', 'png').lower()
+    if fmt not in CHART_FORMATS:
+        return jsonify({'error': f'Unsupported format: {fmt}'}), 400
+    size = None
+    if 'width' in request.args or 'height' in request.args:
+        try:
+            width = float(request.args.get('width', 10))
+            height = float(request.args.get('height', 6))
+        except ValueError:
+            return jsonify({'error': 'width and height must be numbers'}), 400
+        # Figure size in inches; clamp so a request can't ask for a huge render
+        size = (min(max(width, 2.0), 30.0), min(max(height, 2.0), 30.0))
+
+    body = chart_service.get(session.content_hash, session.metrics, chart_type, fmt, size)
+    return Response(body, mimetype=CHART_FORMATS[fmt])
+
+def _process_upload(file_path, progress=None):
+    """Return (session, message) for a file, processing it only if its content is new"""
+    digest = file_hash(file_path)
+    session = upload_sessions.get_by_hash(digest)
+    if session is not None:
+        return session, session.message
+
     advisor = FinancialAdvisor()
-    advisor.process_transaction_data(file_path)
-    advice = advisor.generate_financial_advice()
-    
-    return jsonify({'advice': advice})
+    advisor.on_progress = progress
+    result = advisor.process_transaction_data(file_path, digest)
+    if advisor.summary is None:
+        return None, result
+    session = advisor.to_session(SessionStore.new_id(), digest, result)
+    upload_sessions.put(session)
+    return session, result
+
+def _session_advisor(payload):
+    """Advisor restored from ``upload_id``, falling back to a ``file_path`` upload"""
+    session = None
+    upload_id = payload.get('upload_id')
+    if upload_id:
+        session = upload_sessions.get(upload_id)
+    file_path = payload.get('file_path')
+    if session is None and file_path and os.path.exists(file_path):
+        session, _ = _process_upload(file_path)
+    if session is None:
+        return None
 
-@app.route('/api/question', methods=['POST'])
-def ask_question():
-    file_path = request.json.get('file_path')
-    question = request.json.get('question')
-    
-    if not file_path or not os.path.exists(file_path) or not question:
-        return jsonify({'error': 'Invalid request parameters'}), 400
-    
     advisor = FinancialAdvisor()
-    advisor.process_transaction_data(file_path)
-    answer = advisor.get_response(question)
-    
-    return jsonify({'answer': answer})
+    advisor.restore_session(session)
+    return advisor
+
+def advice_error(e):
+    return {'advice': f"Error generating financial advice: {str(e)}"}, 200
+
+def question_error(e):
+    print(f"Error getting RAG response: {str(e)}")
+    return {'answer': "I apologize, but I'm having trouble processing your financial advice request at the moment. Please try again later."}, 200
+
+@endpoint(app, '/api/advice', error=advice_error, methods=['POST'])
+def get_advice(payload, accept):
+    advisor = _session_advisor(payload)
+    if advisor is None:
+        return Reply({'error': 'Unknown upload_id or invalid file path'}, 400)
+    return advisor.advice_reply(wants_stream(payload, accept))
+
+@endpoint(app, '/api/question', error=question_error, methods=['POST'])
+def ask_question(payload, accept):
+    question = payload.get('question')
+    if not question:
+        return Reply({'error': 'Invalid request parameters'}, 400)
+
+    advisor = _session_advisor(payload)
+    if advisor is None:
+        return Reply({'error': 'Unknown upload_id or invalid file path'}, 400)
+    return advisor.question_reply(question, wants_stream(payload, accept))
 
 def run_terminal_app():
     """Run the financial advisor in terminal mode"""
@@ -489,7 +696,7 @@ def run_terminal_app():
         
         # Check for summary command
         if user_input.lower() == 'summary':
-            if hasattr(advisor, 'categorized_data') and advisor.categorized_data is not None:
+            if advisor.metrics is not None:
                 summary = advisor._generate_transaction_summary()
                 print(f"\n{summary}")
             else:
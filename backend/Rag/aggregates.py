@@ -0,0 +1,104 @@
+from collections import defaultdict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from normalize import parse_amounts
+
+
+class RunningTotals:
+    """Income, expense, per-category and per-month totals accumulated chunk by chunk.
+
+    Only the totals are kept, so memory does not grow with the number of
+    rows streamed through :meth:`update`.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.income = 0.0
+        self.expenses = 0.0
+        self.category_expenses: Dict[str, float] = defaultdict(float)
+        self.monthly_income: Dict[str, float] = defaultdict(float)
+        self.monthly_expenses: Dict[str, float] = defaultdict(float)
+
+    def update(self, amounts, categories=None, months=None) -> None:
+        """Fold in one chunk: a numeric amount Series plus aligned category/month Series."""
+        self.rows += len(amounts)
+        income = amounts > 0
+        expense = amounts < 0
+        self.income += float(amounts[income].sum())
+        self.expenses += float(-amounts[expense].sum())
+        if categories is not None:
+            for category, total in amounts[expense].groupby(categories[expense]).sum().items():
+                self.category_expenses[category] += float(-total)
+        if months is not None:
+            for month, total in amounts[income].groupby(months[income]).sum().items():
+                self.monthly_income[month] += float(total)
+            for month, total in amounts[expense].groupby(months[expense]).sum().items():
+                self.monthly_expenses[month] += float(-total)
+
+    @property
+    def net(self) -> float:
+        return self.income - self.expenses
+
+
+class FinancialMetrics(NamedTuple):
+    """Everything the summary, charts and advice read, computed once per dataset.
+
+    Expense figures are positive. ``category_expenses`` is sorted largest
+    first; ``monthly`` holds ``(month, income, expenses)`` in month order
+    for the months that have transactions (months with none are left out;
+    a month with only income or only expenses has zero for the other).
+    """
+    rows: int
+    income: float
+    expenses: float
+    category_expenses: Tuple[Tuple[str, float], ...]
+    monthly: Tuple[Tuple[str, float, float], ...]
+
+    @property
+    def net(self) -> float:
+        return self.income - self.expenses
+
+    @property
+    def savings_rate(self) -> float:
+        return (self.income - self.expenses) / self.income * 100 if self.income > 0 else 0.0
+
+    @classmethod
+    def from_frame(cls, df, amount_col: Optional[str], date_col: Optional[str] = None,
+                   category_col: str = "category") -> "FinancialMetrics":
+        import pandas as pd
+
+        if not amount_col:
+            return cls(len(df), 0.0, 0.0, (), ())
+        # Accumulate in float64 even when the column is stored compactly
+        amounts = parse_amounts(df[amount_col])
+
+        # One signed split, reused by every breakdown below
+        sign = pd.Series(0, index=df.index, dtype="int8").mask(amounts > 0, 1).mask(amounts < 0, -1)
+        flow = amounts.groupby(sign).sum()
+        income = float(flow.get(1, 0.0))
+        expenses = float(-flow.get(-1, 0.0))
+
+        categories: Tuple = ()
+        if category_col in df.columns:
+            spent = -amounts[sign == -1].groupby(df[category_col][sign == -1], observed=True).sum()
+            categories = tuple((str(c), float(v)) for c, v in spent.sort_values(ascending=False).items())
+
+        monthly: Tuple = ()
+        if date_col:
+            months = pd.to_datetime(df[date_col], errors='coerce').dt.strftime('%Y-%m')
+            pivot = amounts[sign != 0].groupby([months[sign != 0], sign[sign != 0]]).sum().unstack(fill_value=0.0)
+            pivot = pivot.reindex(columns=[1, -1], fill_value=0.0).sort_index()
+            monthly = tuple((str(m), float(i), 0.0 - float(e)) for m, i, e in pivot.itertuples())
+
+        return cls(len(df), income, expenses, categories, monthly)
+
+    @classmethod
+    def from_totals(cls, totals: RunningTotals) -> "FinancialMetrics":
+        months = sorted(set(totals.monthly_income) | set(totals.monthly_expenses))
+        return cls(
+            totals.rows,
+            totals.income,
+            totals.expenses,
+            tuple(sorted(totals.category_expenses.items(), key=lambda item: item[1], reverse=True)),
+            tuple((m, totals.monthly_income.get(m, 0.0), totals.monthly_expenses.get(m, 0.0)) for m in months),
+        )
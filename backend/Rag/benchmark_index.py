@@ -0,0 +1,135 @@
+"""Recall-vs-latency report for the VectorIndex backends.
+
+Every configuration is measured against the exact flat index on the same
+vectors and queries. Run from ``backend/``:
+
+    python -m Rag.benchmark_index --pdf statement1.pdf statement2.pdf
+    python -m Rag.benchmark_index --synthetic 100000 --output report.md
+
+``--pdf`` embeds real statement chunks with the production encoder;
+``--synthetic`` uses clustered random vectors of the MiniLM dimension so the
+sweep can be run without a model download.
+"""
+import argparse
+import time
+from typing import List, Tuple
+
+import numpy as np
+import faiss
+
+from .index_backends import IndexConfig, VectorIndex
+
+DIMENSION = 384
+
+SWEEP = [
+    ("flat", {}),
+    ("ivf_flat", {"nprobe": 1}),
+    ("ivf_flat", {"nprobe": 4}),
+    ("ivf_flat", {"nprobe": 16}),
+    ("ivf_flat", {"nprobe": 64}),
+    ("hnsw", {"ef_search": 16}),
+    ("hnsw", {"ef_search": 64}),
+    ("hnsw", {"ef_search": 256}),
+    ("ivf_pq", {"nprobe": 4}),
+    ("ivf_pq", {"nprobe": 16}),
+    ("ivf_pq", {"nprobe": 64}),
+]
+
+
+def synthetic_vectors(n: int, n_queries: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    # Clustered data behaves like sentence embeddings far better than uniform noise
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, n // 200), DIMENSION)).astype(np.float32)
+    def sample(count):
+        picks = rng.integers(len(centers), size=count)
+        return centers[picks] + 0.35 * rng.normal(size=(count, DIMENSION)).astype(np.float32)
+    return sample(n).astype(np.float32), sample(n_queries).astype(np.float32)
+
+
+def pdf_vectors(paths: List[str], n_queries: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    from . import RAGSystem
+    system = RAGSystem()
+    system.load_pdfs(paths)
+    ids = np.fromiter(system.chunks, dtype=np.int64)
+    vectors = np.vstack([system.index.reconstruct(i) for i in ids]).astype(np.float32)
+    # Perturbed chunks stand in for queries that paraphrase statement text
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(len(vectors), size=n_queries)
+    queries = vectors[picks] + 0.05 * rng.normal(size=(n_queries, vectors.shape[1])).astype(np.float32)
+    return vectors, queries
+
+
+def measure(index: VectorIndex, queries: np.ndarray, k: int):
+    latencies = []
+    results = []
+    for q in queries:
+        start = time.perf_counter()
+        _, I = index.search(q[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(I[0])
+    return np.array(results), np.array(latencies)
+
+
+def run(vectors: np.ndarray, queries: np.ndarray, k: int) -> List[dict]:
+    ids = np.arange(len(vectors), dtype=np.int64)
+    rows = []
+    truth = None
+    for kind, knobs in SWEEP:
+        config = IndexConfig(kind=kind, train_threshold=0, **knobs)
+        start = time.perf_counter()
+        index = VectorIndex(vectors.shape[1], config)
+        index.add(vectors, ids)
+        build_s = time.perf_counter() - start
+
+        results, latencies = measure(index, queries, k)
+        if truth is None:
+            truth = results
+        recall = np.mean([len(set(r) & set(t)) / k for r, t in zip(results, truth)])
+        rows.append({
+            "kind": kind,
+            "knobs": ", ".join(f"{key}={value}" for key, value in knobs.items()) or "-",
+            "recall": recall,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "build_s": build_s,
+            "size_mb": len(faiss.serialize_index(index.index)) / 1e6,
+        })
+    return rows
+
+
+def format_report(rows: List[dict], n: int, n_queries: int, k: int) -> str:
+    lines = [
+        f"Corpus: {n} vectors, {n_queries} queries, recall@{k} vs flat\n",
+        "| index | knobs | recall | p50 ms | p99 ms | build s | size MB |",
+        "|---|---|---|---|---|---|---|",
+    ]
+    for r in rows:
+        lines.append(f"| {r['kind']} | {r['knobs']} | {r['recall']:.3f} | {r['p50_ms']:.3f} | "
+                     f"{r['p99_ms']:.3f} | {r['build_s']:.2f} | {r['size_mb']:.1f} |")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", nargs="+", help="Statements to embed and index")
+    parser.add_argument("--synthetic", type=int, default=50000, help="Synthetic corpus size when no --pdf is given")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--output", help="Also write the markdown table to this file")
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(1)  # per-request latency is single-threaded in the server
+    if args.pdf:
+        vectors, queries = pdf_vectors(args.pdf, args.queries)
+    else:
+        vectors, queries = synthetic_vectors(args.synthetic, args.queries)
+
+    report = format_report(run(vectors, queries, args.k), len(vectors), len(queries), args.k)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
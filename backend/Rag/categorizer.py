@@ -0,0 +1,200 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+CATEGORIES = [
+    "Food", "Shopping", "Transportation", "Housing", "Utilities", "Healthcare",
+    "Entertainment", "Travel", "Education", "Income", "Savings", "Other",
+]
+
+# Keyword rules over the raw upper-cased description, checked in order
+RULES = [
+    (r"SALARY|PAYROLL|INTEREST CR|INT\.? ?CR|DIVIDEND|CASHBACK|REFUND", "Income"),
+    (r"MUTUAL ?FUND|\bSIP\b|\bRD\b|\bFD\b|\bPPF\b|ZERODHA|GROWW|UPSTOX|\bNPS\b|RECURRING DEP", "Savings"),
+    (r"SWIGGY|ZOMATO|DOMINOS|PIZZA|MCDONALD|KFC|STARBUCKS|CAFE|RESTAURANT|BAKERY|BIGBASKET|BLINKIT|ZEPTO|DUNZO|GROCER|SUPERMARKET|DMART", "Food"),
+    (r"\bUBER\b|\bOLA\b|RAPIDO|METRO|PETROL|FUEL|\bHPCL\b|\bBPCL\b|INDIAN ?OIL|FASTAG|PARKING", "Transportation"),
+    (r"IRCTC|MAKEMYTRIP|GOIBIBO|CLEARTRIP|YATRA|INDIGO|AIR ?INDIA|VISTARA|SPICEJET|\bOYO\b|HOTEL|AIRBNB|REDBUS", "Travel"),
+    (r"NETFLIX|SPOTIFY|PRIME ?VIDEO|HOTSTAR|BOOKMYSHOW|YOUTUBE|\bPVR\b|INOX|STEAM|PLAYSTATION", "Entertainment"),
+    (r"ELECTRICITY|BESCOM|TNEB|MSEDCL|WATER BILL|\bGAS\b|BROADBAND|AIRTEL|\bJIO\b|VODAFONE|\bVI\b|BSNL|RECHARGE|DTH|TATA ?SKY", "Utilities"),
+    (r"\bRENT\b|MAINTENANCE|SOCIETY|HOUSING|NOBROKER|\bEMI\b|HOME LOAN", "Housing"),
+    (r"PHARM|MEDICAL|HOSPITAL|CLINIC|APOLLO|\bPRACTO\b|1MG|NETMEDS|DIAGNOSTIC|HEALTH", "Healthcare"),
+    (r"SCHOOL|COLLEGE|UNIVERSITY|TUITION|UDEMY|COURSERA|BYJU|UNACADEMY|EXAM FEE", "Education"),
+    (r"AMAZON|FLIPKART|MYNTRA|AJIO|MEESHO|NYKAA|DECATHLON|IKEA|CROMA|RELIANCE DIGITAL|SHOPPERS", "Shopping"),
+]
+_COMPILED_RULES = [(re.compile(pattern), category) for pattern, category in RULES]
+
+# Rails, reference markers and boilerplate that carry no merchant identity
+_NOISE_WORDS = {
+    "UPI", "NEFT", "IMPS", "RTGS", "POS", "ACH", "ECS", "NACH", "DEBIT", "CREDIT", "DR", "CR",
+    "CARD", "TXN", "REF", "NO", "VPS", "IPS", "MB", "IB", "INB", "BILLPAY", "PAYMENT", "PAY",
+    "TO", "FROM", "BY", "TRANSFER", "TRF", "INDIA", "PVT", "PRIVATE", "LTD", "LIMITED", "THE",
+    "OKAXIS", "OKICICI", "OKHDFCBANK", "OKSBI", "YBL", "PAYTM", "IBL", "AXL",
+}
+
+
+def normalize_merchant(description: str) -> str:
+    """Reduce a raw description to a stable merchant key.
+
+    ``UPI-SWIGGY-4821-okicici`` and ``POS 4821XXXX SWIGGY BANGALORE`` both
+    become keys starting with ``SWIGGY``; reference numbers, dates and
+    amounts are dropped so recurring merchants share one cache entry.
+    """
+    words = re.sub(r"[^A-Z0-9]+", " ", str(description).upper()).split()
+    words = [w for w in words if not any(ch.isdigit() for ch in w) and w not in _NOISE_WORDS]
+    return " ".join(words[:3])
+
+
+def match_rule(description: str) -> Optional[str]:
+    text = str(description).upper()
+    for pattern, category in _COMPILED_RULES:
+        if pattern.search(text):
+            return category
+    return None
+
+
+def valid_category(label: str) -> Optional[str]:
+    """Map a model answer onto the fixed category set, or None."""
+    label = re.sub(r"^[\s\d.):-]+", "", str(label)).strip().strip(".").lower()
+    for category in CATEGORIES:
+        if label == category.lower():
+            return category
+    return None
+
+
+def parse_indexed_labels(text: str, count: int) -> Dict[int, str]:
+    """Parse a ``{"1": "Food", ...}`` reply into valid categories by 0-based index.
+
+    Tolerates code fences and prose around the object; indices outside
+    ``1..count`` and labels outside :data:`CATEGORIES` are dropped so the
+    caller can re-request just those rows.
+    """
+    match = re.search(r"\{.*\}", str(text), re.S)
+    if not match:
+        return {}
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    if isinstance(data.get("categories"), dict):
+        data = data["categories"]
+    labels = {}
+    for key, label in data.items():
+        try:
+            index = int(str(key).strip()) - 1
+        except ValueError:
+            continue
+        category = valid_category(label) if isinstance(label, str) else None
+        if 0 <= index < count and category:
+            labels[index] = category
+    return labels
+
+
+class CategoryCache:
+    """Persistent merchant-key -> category map in SQLite, shared across uploads."""
+
+    def __init__(self, path: Path):
+        self._lock = threading.Lock()
+        self._db = None
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS categories (merchant TEXT PRIMARY KEY, category TEXT NOT NULL)")
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"Category cache disabled: {e}")
+            self._db = None
+
+    def get_many(self, merchants: Sequence[str]) -> Dict[str, str]:
+        if self._db is None or not merchants:
+            return {}
+        found = {}
+        with self._lock:
+            for start in range(0, len(merchants), 500):
+                part = list(merchants[start:start + 500])
+                rows = self._db.execute(
+                    f"SELECT merchant, category FROM categories WHERE merchant IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def put_many(self, entries: Dict[str, str]) -> None:
+        if self._db is None or not entries:
+            return
+        with self._lock:
+            try:
+                self._db.executemany("INSERT OR REPLACE INTO categories (merchant, category) VALUES (?, ?)",
+                                     list(entries.items()))
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Error writing category cache: {e}")
+
+
+def default_cache_path() -> Path:
+    return Path(os.environ.get("CATEGORY_CACHE_PATH", Path(__file__).parent / ".rag_cache" / "categories.sqlite3"))
+
+
+class TransactionCategorizer:
+    """Tiered categorization: keyword rules, then the persistent cache, then the LLM.
+
+    ``llm_categorize`` receives the descriptions no earlier tier resolved
+    (one representative per merchant, plus every row with no merchant key)
+    and returns a category or None for each; valid merchant answers are
+    written back to the cache.
+    """
+
+    def __init__(self, llm_categorize: Callable[[List[str]], List[Optional[str]]],
+                 cache: Optional[CategoryCache] = None):
+        self.llm_categorize = llm_categorize
+        self.cache = cache if cache is not None else CategoryCache(default_cache_path())
+        self.stats = {"rule": 0, "cache": 0, "llm": 0, "unresolved": 0}
+
+    def categorize(self, descriptions: Sequence[str]) -> List[Optional[str]]:
+        keys = [normalize_merchant(d) for d in descriptions]
+        resolved: Dict[str, str] = {}
+        representative: Dict[str, str] = {}
+        # Rows with no merchant key (bare UPI/NEFT references) cannot share an
+        # answer or be cached, so each goes to the LLM on its own
+        unkeyed: Dict[int, Optional[str]] = {}
+
+        for i, (description, key) in enumerate(zip(descriptions, keys)):
+            if key and (key in resolved or key in representative):
+                continue
+            category = match_rule(description)
+            if category:
+                self.stats["rule"] += 1
+                if key:
+                    resolved[key] = category
+                else:
+                    unkeyed[i] = category
+            elif key:
+                representative[key] = description
+            else:
+                unkeyed[i] = None
+
+        cached = self.cache.get_many(list(representative))
+        for key, category in cached.items():
+            resolved[key] = category
+            representative.pop(key)
+        self.stats["cache"] += len(cached)
+
+        pending = [i for i, category in unkeyed.items() if category is None]
+        if representative or pending:
+            answers = self.llm_categorize(list(representative.values()) + [descriptions[i] for i in pending])
+            categories = [valid_category(answer) if answer else None for answer in answers]
+            learned = {key: category for key, category in zip(list(representative), categories) if category}
+            resolved.update(learned)
+            self.cache.put_many(learned)
+            for i, category in zip(pending, categories[len(representative):]):
+                unkeyed[i] = category
+            answered = len(learned) + sum(1 for i in pending if unkeyed[i])
+            self.stats["llm"] += answered
+            self.stats["unresolved"] += len(representative) + len(pending) - answered
+
+        return [unkeyed[i] if i in unkeyed else resolved.get(key) for i, key in enumerate(keys)]
@@ -0,0 +1,124 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+CHART_TYPES = ("category_pie", "monthly_comparison")
+FORMATS = {"png": "image/png", "svg": "image/svg+xml", "json": "application/json"}
+DEFAULT_SIZES = {"category_pie": (10.0, 6.0), "monthly_comparison": (12.0, 6.0)}
+
+
+def available_charts(metrics) -> List[str]:
+    """Chart types that have data for these metrics."""
+    if metrics is None or not metrics.category_expenses:
+        return []
+    charts = ["category_pie"]
+    if metrics.monthly:
+        charts.append("monthly_comparison")
+    return charts
+
+
+def chart_series(metrics, chart_type: str) -> Dict:
+    """The raw numbers behind a chart, for clients that draw their own."""
+    if chart_type == "category_pie":
+        # Only show top 6 categories, group the rest as "Other"
+        labels = [cat for cat, _ in metrics.category_expenses[:6]]
+        values = [amount for _, amount in metrics.category_expenses[:6]]
+        other_sum = sum(amount for _, amount in metrics.category_expenses[6:])
+        if other_sum > 0:
+            labels.append("Other")
+            values.append(other_sum)
+        return {"title": "Spending by Category", "labels": labels, "values": values}
+    if chart_type == "monthly_comparison":
+        return {
+            "title": "Monthly Income vs Expenses",
+            "months": [month for month, _, _ in metrics.monthly],
+            "income": [income for _, income, _ in metrics.monthly],
+            "expenses": [expenses for _, _, expenses in metrics.monthly],
+        }
+    raise ValueError(f"Unknown chart type: {chart_type}")
+
+
+def render_chart(metrics, chart_type: str, fmt: str = "png", size: Tuple[float, float] = None) -> bytes:
+    """Draw one chart on a private Figure (no pyplot state, safe across threads)."""
+    series = chart_series(metrics, chart_type)
+    if fmt == "json":
+        import json
+        return json.dumps(series).encode("utf-8")
+
+    fig = Figure(figsize=size or DEFAULT_SIZES[chart_type])
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    if chart_type == "category_pie":
+        ax.pie(series["values"], labels=series["labels"], autopct='%1.1f%%', startangle=90)
+        ax.axis('equal')
+    else:
+        x = range(len(series["months"]))
+        width = 0.35
+        ax.bar([i - width / 2 for i in x], series["income"], width, label='Income')
+        ax.bar([i + width / 2 for i in x], series["expenses"], width, label='Expenses')
+        ax.set_xlabel('Month')
+        ax.set_ylabel('Amount ($)')
+        ax.set_xticks(list(x))
+        ax.set_xticklabels(series["months"], rotation=45)
+        ax.legend()
+        fig.tight_layout()
+    ax.set_title(series["title"])
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format=fmt)
+    return buf.getvalue()
+
+
+class ChartService:
+    """Renders charts on first request and caches them by (dataset, type, format, size).
+
+    Concurrent requests for the same chart wait for one render instead of
+    each drawing it.
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[Tuple, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._rendering: Dict[Tuple, threading.Lock] = {}
+        self.renders = 0
+
+    @classmethod
+    def from_env(cls) -> "ChartService":
+        return cls(max_entries=int(os.environ.get("CHART_CACHE_SIZE", 128)))
+
+    def get(self, dataset: str, metrics, chart_type: str, fmt: str = "png",
+            size: Tuple[float, float] = None) -> bytes:
+        if chart_type not in CHART_TYPES:
+            raise ValueError(f"Unknown chart type: {chart_type}")
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported chart format: {fmt}")
+        size = tuple(size) if size else DEFAULT_SIZES[chart_type]
+        key = (dataset, chart_type, fmt, size if fmt != "json" else None)
+
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            render_lock = self._rendering.setdefault(key, threading.Lock())
+
+        with render_lock:
+            with self._lock:
+                if key in self._cache:
+                    return self._cache[key]
+            try:
+                body = render_chart(metrics, chart_type, fmt, size)
+                with self._lock:
+                    self.renders += 1
+                    self._cache[key] = body
+                    while len(self._cache) > self.max_entries:
+                        self._cache.popitem(last=False)
+            finally:
+                with self._lock:
+                    self._rendering.pop(key, None)
+        return body
@@ -0,0 +1,151 @@
+import os
+import re
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+
+class Chunk(NamedTuple):
+    text: str
+    page: int   # 1-based page number in the source PDF
+    start: int  # character offsets into that page's extracted text
+    end: int
+
+
+def _lines(text: str) -> Iterator[Tuple[int, int]]:
+    """(start, end) of each non-blank line, without the newline."""
+    for match in re.finditer(r"[^\n]+", text):
+        start, end = match.span()
+        # Trim surrounding whitespace but keep offsets pointing into text
+        stripped = match.group().strip()
+        if stripped:
+            start += len(match.group()) - len(match.group().lstrip())
+            yield start, start + len(stripped)
+
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+# Dotted words common in statements that do not end a sentence
+_ABBREVIATIONS = ("rs.", "no.", "a/c.", "dr.", "cr.", "ref.", "mr.", "mrs.", "ms.")
+
+
+def _sentences(text: str) -> Iterator[Tuple[int, int]]:
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        if "\n" not in match.group() and text[start:match.start()].lower().endswith(_ABBREVIATIONS):
+            continue
+        if text[start:match.start()].strip():
+            yield start, match.start()
+        start = match.end()
+    if text[start:].strip():
+        yield start, len(text.rstrip())
+
+
+class Chunker:
+    """Splits extracted page texts into chunks.
+
+    ``split`` is a generator so pages can be streamed through it. Chunks
+    never span a page boundary, which keeps their page metadata exact.
+    """
+
+    name = "base"
+
+    def __init__(self, max_chars: int = 512, overlap: int = 0):
+        self.max_chars = max_chars
+        self.overlap = overlap
+
+    def params(self) -> Dict:
+        # Part of the RAG cache key: changing any of these re-chunks documents
+        return {"chunker": self.name, "chunk_size": self.max_chars, "chunk_overlap": self.overlap}
+
+    def split(self, pages: Iterable[str]) -> Iterator[Chunk]:
+        for page_number, text in enumerate(pages, start=1):
+            yield from self.split_page(text or "", page_number)
+
+    def split_page(self, text: str, page: int) -> Iterator[Chunk]:
+        raise NotImplementedError
+
+    def _pack(self, text: str, page: int, spans: List[Tuple[int, int]], overlap: int = 0) -> Iterator[Chunk]:
+        """Greedily group consecutive spans into chunks of at most max_chars.
+
+        ``overlap`` repeats that many trailing spans at the head of the next chunk.
+        """
+        group: List[Tuple[int, int]] = []
+        for span in spans:
+            if span[1] - span[0] > self.max_chars:
+                # A single unbreakable span: flush, then hard-split it
+                if group:
+                    yield Chunk(text[group[0][0]:group[-1][1]], page, group[0][0], group[-1][1])
+                    group = []
+                for s in range(span[0], span[1], self.max_chars):
+                    e = min(s + self.max_chars, span[1])
+                    yield Chunk(text[s:e], page, s, e)
+                continue
+            if group and span[1] - group[0][0] > self.max_chars:
+                yield Chunk(text[group[0][0]:group[-1][1]], page, group[0][0], group[-1][1])
+                group = group[len(group) - overlap:] if 0 < overlap < len(group) else []
+                while group and span[1] - group[0][0] > self.max_chars:
+                    group.pop(0)
+            group.append(span)
+        if group:
+            yield Chunk(text[group[0][0]:group[-1][1]], page, group[0][0], group[-1][1])
+
+
+class FixedChunker(Chunker):
+    """Fixed-width character windows (the original behaviour), per page."""
+
+    name = "fixed"
+
+    def split_page(self, text: str, page: int) -> Iterator[Chunk]:
+        step = max(1, self.max_chars - self.overlap)
+        for start in range(0, len(text), step):
+            end = min(start + self.max_chars, len(text))
+            if text[start:end].strip():
+                yield Chunk(text[start:end], page, start, end)
+            if end == len(text):
+                break
+
+
+class LineChunker(Chunker):
+    """Packs whole lines, so a statement row is never cut in half."""
+
+    name = "lines"
+
+    def split_page(self, text: str, page: int) -> Iterator[Chunk]:
+        return self._pack(text, page, list(_lines(text)), self.overlap)
+
+
+class SentenceChunker(Chunker):
+    """Packs whole sentences; ``overlap`` is a number of sentences."""
+
+    name = "sentences"
+
+    def split_page(self, text: str, page: int) -> Iterator[Chunk]:
+        return self._pack(text, page, list(_sentences(text)), self.overlap)
+
+
+class PageChunker(Chunker):
+    """One chunk per page, falling back to line packing for long pages."""
+
+    name = "pages"
+
+    def split_page(self, text: str, page: int) -> Iterator[Chunk]:
+        stripped = text.strip()
+        if not stripped:
+            return iter(())
+        if len(stripped) <= self.max_chars:
+            start = text.index(stripped)
+            return iter([Chunk(stripped, page, start, start + len(stripped))])
+        return self._pack(text, page, list(_lines(text)), self.overlap)
+
+
+CHUNKERS = {cls.name: cls for cls in (FixedChunker, LineChunker, SentenceChunker, PageChunker)}
+
+
+def get_chunker(name: str = None, max_chars: int = None, overlap: int = None) -> Chunker:
+    """Build a chunker by name, defaulting to the RAG_CHUNKER* environment variables."""
+    name = name or os.environ.get("RAG_CHUNKER", "lines")
+    if name not in CHUNKERS:
+        raise ValueError(f"Unknown chunker {name!r}; expected one of {', '.join(CHUNKERS)}")
+    if max_chars is None:
+        max_chars = int(os.environ.get("RAG_CHUNK_SIZE", 512))
+    if overlap is None:
+        overlap = int(os.environ.get("RAG_CHUNK_OVERLAP", 0))
+    return CHUNKERS[name](max_chars=max_chars, overlap=overlap)
@@ -0,0 +1,141 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .lexical import FUSION_DEPTH
+
+
+class _Request:
+    __slots__ = ("system", "query", "k", "doc_ids", "future")
+
+    def __init__(self, system, query: str, k: int, doc_ids: Optional[frozenset]):
+        self.system = system
+        self.query = query
+        self.k = k
+        self.doc_ids = doc_ids
+        self.future: Future = Future()
+
+
+class QueryCoalescer:
+    """Merges concurrent retrieval requests into batched encode + search calls.
+
+    Requests arriving within ``window_ms`` of each other (up to
+    ``max_batch``) are encoded in one model call and searched with one
+    multi-row FAISS query per (corpus, document filter). A request that is
+    alone in flight is dispatched immediately, so low load pays no window.
+    """
+
+    def __init__(self, encoder, window_ms: float = 5.0, max_batch: int = 32):
+        self.encoder = encoder
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.batches = 0
+        self.requests = 0
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._inflight = 0
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls, encoder) -> "QueryCoalescer":
+        return cls(
+            encoder,
+            window_ms=float(os.environ.get("RAG_COALESCE_WINDOW_MS", 5)),
+            max_batch=int(os.environ.get("RAG_COALESCE_MAX_BATCH", 32)),
+        )
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="rag-coalescer", daemon=True)
+            self._worker.start()
+
+    def submit(self, system, query: str, k: int = 3, doc_ids: Optional[Iterable[str]] = None) -> Future:
+        request = _Request(system, query, k, frozenset(doc_ids) if doc_ids is not None else None)
+        with self._lock:
+            self._inflight += 1
+            self._ensure_worker()
+        self._queue.put(request)
+        return request.future
+
+    def search(self, system, query: str, k: int = 3, doc_ids: Optional[Iterable[str]] = None):
+        return self.submit(system, query, k, doc_ids).result()
+
+    def get_relevant_chunks(self, system, query: str, k: int = 3,
+                            doc_ids: Optional[Iterable[str]] = None) -> List[str]:
+        return [chunk.text for chunk, _ in self.search(system, query, k, doc_ids)]
+
+    def _collect(self) -> List[_Request]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            with self._lock:
+                alone = self._inflight <= len(batch)
+            if alone and self._queue.empty():
+                # Nobody else is waiting; don't hold this caller for the window
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            try:
+                self._dispatch(batch)
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._inflight -= len(batch)
+
+    def _dispatch(self, batch: List[_Request]) -> None:
+        self.batches += 1
+        self.requests += len(batch)
+
+        # Hybrid corpora answer confident exact-match queries from BM25 alone
+        lexical = {}
+        to_encode = []
+        for row, request in enumerate(batch):
+            if getattr(request.system, "retrieval_mode", "dense") == "hybrid":
+                hits, confident = request.system.lexical_lookup(request.query, request.k, request.doc_ids)
+                if confident:
+                    request.future.set_result(hits[:request.k])
+                    continue
+                lexical[row] = hits
+            to_encode.append(row)
+        if not to_encode:
+            return
+
+        vectors = self.encoder.encode([batch[row].query for row in to_encode])
+
+        groups: Dict[Tuple[int, Optional[frozenset]], List[int]] = {}
+        for position, row in enumerate(to_encode):
+            request = batch[row]
+            groups.setdefault((id(request.system), request.doc_ids), []).append(position)
+
+        for positions in groups.values():
+            first = batch[to_encode[positions[0]]]
+            k = max(batch[to_encode[p]].k for p in positions)
+            if lexical:
+                k = max(k, FUSION_DEPTH)
+            results = first.system.search_vectors(vectors[positions], k, first.doc_ids)
+            for position, hits in zip(positions, results):
+                row = to_encode[position]
+                request = batch[row]
+                if row in lexical:
+                    hits = request.system.fuse(lexical[row], hits, request.k)
+                request.future.set_result(hits[:request.k])
+
+    def stats(self) -> Dict:
+        return {"batches": self.batches, "requests": self.requests,
+                "mean_batch": self.requests / self.batches if self.batches else 0.0}
@@ -0,0 +1,151 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+
+def normalize_text(text: str, lowercase: bool = True) -> str:
+    # MiniLM is uncased, so case and spacing do not change the vector
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.lower() if lowercase else text
+
+
+class CachedEncoder:
+    """Wraps a SentenceTransformer-like model with an embedding cache.
+
+    Vectors are keyed by (model name, normalized text hash) and looked up
+    in an in-memory LRU, then an on-disk SQLite table, before the model is
+    called; only misses are encoded, in batches of ``batch_size``.
+    """
+
+    def __init__(self, model, model_name: str, cache_path: Optional[Path] = None,
+                 max_entries: int = 10000, batch_size: int = 32, normalize: bool = False,
+                 lowercase: bool = True):
+        self.model = model
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self.normalize = normalize
+        self.lowercase = lowercase
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if cache_path is not None:
+            try:
+                self._db = self._open_db(Path(cache_path))
+            except sqlite3.Error as e:
+                print(f"Embedding disk cache disabled: {e}")
+
+    @classmethod
+    def from_env(cls, model, model_name: str, cache_dir: Path) -> "CachedEncoder":
+        env = os.environ
+        use_disk = env.get("RAG_EMBED_DISK_CACHE", "1") != "0"
+        return cls(
+            model,
+            model_name,
+            cache_path=Path(cache_dir) / "embeddings.sqlite3" if use_disk else None,
+            max_entries=int(env.get("RAG_EMBED_CACHE_SIZE", 10000)),
+            batch_size=int(env.get("RAG_ENCODE_BATCH", 32)),
+            normalize=env.get("RAG_NORMALIZE_EMBEDDINGS", "0") == "1",
+        )
+
+    @staticmethod
+    def _open_db(path: Path) -> sqlite3.Connection:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+        # WAL lets several server processes read while one writes
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        db.commit()
+        return db
+
+    def params(self) -> Dict:
+        # Part of the RAG cache key: these change the stored vectors
+        return {"model": self.model_name, "normalize_embeddings": self.normalize}
+
+    def _key(self, text: str) -> str:
+        flag = "n" if self.normalize else "r"
+        payload = f"{self.model_name}\0{flag}\0{normalize_text(text, self.lowercase)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def encode(self, texts: Sequence[str], batch_size: Optional[int] = None, **kwargs) -> np.ndarray:
+        if isinstance(texts, str):
+            texts = [texts]
+        keys = [self._key(t) for t in texts]
+        found: Dict[str, np.ndarray] = {}
+
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+
+            missing = list(dict.fromkeys(k for k in keys if k not in found))
+            if missing and self._db is not None:
+                for start in range(0, len(missing), 500):
+                    part = missing[start:start + 500]
+                    rows = self._db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32)
+                        found[key] = vector
+                        self._remember(key, vector)
+
+        # Encode each distinct missing text once, outside the lock
+        to_encode: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in to_encode:
+                to_encode[key] = text
+        self.hits += len(keys) - len(to_encode)
+        self.misses += len(to_encode)
+
+        if to_encode:
+            vectors = np.asarray(self.model.encode(
+                list(to_encode.values()),
+                batch_size=batch_size or self.batch_size,
+                normalize_embeddings=self.normalize,
+                show_progress_bar=False,
+                convert_to_numpy=True,
+            ), dtype=np.float32)
+            with self._lock:
+                for key, vector in zip(to_encode, vectors):
+                    found[key] = vector
+                    self._remember(key, vector)
+                if self._db is not None:
+                    try:
+                        self._db.executemany(
+                            "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                            [(key, vector.tobytes()) for key, vector in zip(to_encode, vectors)],
+                        )
+                        self._db.commit()
+                    except sqlite3.Error as e:
+                        # A failed cache write must never fail the encode
+                        print(f"Error writing embedding cache: {e}")
+
+        if not keys:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        return np.vstack([found[key] for key in keys])
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0, "memory_entries": len(self._memory)}
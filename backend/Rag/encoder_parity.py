@@ -0,0 +1,108 @@
+"""Retrieval parity check between two encoder backends.
+
+Encodes the same statement chunks and queries with a reference backend
+(default ``torch``) and a candidate (default ``onnx``) and reports vector
+cosine similarity, top-k overlap and encode latency. Exits non-zero when
+the candidate is outside tolerance. Run from ``backend/``:
+
+    python -m Rag.encoder_parity --pdf statement.pdf
+"""
+import argparse
+import sys
+import time
+from typing import List
+
+import numpy as np
+import faiss
+
+from .chunking import get_chunker
+from .encoders import get_encoder
+from .extraction import iter_pages
+
+# Queries the voice assistant sees most, plus transaction lookups
+QUERIES = [
+    "what's my balance",
+    "how much did I spend",
+    "how much did I spend on food this month",
+    "payment to swiggy",
+    "salary credited",
+    "uber rides",
+    "largest transaction",
+    "electricity bill payment",
+    "atm cash withdrawal",
+    "refund received",
+]
+
+SAMPLE_CHUNKS = [
+    "01/03/2024 UPI-SWIGGY-4821 Rs. 450.00 Balance 23,550.00",
+    "02/03/2024 UPI-UBER-1932 Rs. 212.00 Balance 23,338.00",
+    "03/03/2024 NEFT SALARY CREDIT ACME LTD Rs. 85,000.00 Balance 108,338.00",
+    "05/03/2024 ATM WDL MG ROAD Rs. 5,000.00 Balance 103,338.00",
+    "07/03/2024 BESCOM ELECTRICITY BILL Rs. 1,840.00 Balance 101,498.00",
+    "09/03/2024 NETFLIX SUBSCRIPTION Rs. 649.00 Balance 100,849.00",
+    "11/03/2024 AMAZON REFUND Rs. 1,299.00 Balance 102,148.00",
+    "12/03/2024 UPI-ZOMATO-7731 Rs. 380.00 Balance 101,768.00",
+]
+
+
+def _chunks(pdf_paths: List[str]) -> List[str]:
+    if not pdf_paths:
+        return SAMPLE_CHUNKS
+    chunker = get_chunker()
+    return [chunk.text for path in pdf_paths for chunk in chunker.split(iter_pages(path))]
+
+
+def _timed_encode(encoder, texts):
+    encoder.encode(texts[:1])  # load the model outside the measurement
+    start = time.perf_counter()
+    vectors = np.asarray(encoder.encode(texts), dtype=np.float32)
+    return vectors, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", nargs="*", default=[])
+    parser.add_argument("--reference", default="torch")
+    parser.add_argument("--candidate", default="onnx")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    parser.add_argument("--min-overlap", type=float, default=0.9)
+    args = parser.parse_args()
+
+    chunks = _chunks(args.pdf)
+    reference, candidate = get_encoder(args.reference), get_encoder(args.candidate)
+    ref_chunks, ref_time = _timed_encode(reference, chunks)
+    cand_chunks, cand_time = _timed_encode(candidate, chunks)
+    ref_queries = np.asarray(reference.encode(QUERIES), dtype=np.float32)
+    cand_queries = np.asarray(candidate.encode(QUERIES), dtype=np.float32)
+
+    if ref_chunks.shape[1] != cand_chunks.shape[1]:
+        print(f"FAIL: dimension {ref_chunks.shape[1]} vs {cand_chunks.shape[1]}")
+        sys.exit(1)
+
+    def unit(v):
+        return v / np.clip(np.linalg.norm(v, axis=1, keepdims=True), 1e-12, None)
+    cosine = np.sum(unit(ref_chunks) * unit(cand_chunks), axis=1)
+
+    k = min(args.k, len(chunks))
+    ref_index = faiss.IndexFlatL2(ref_chunks.shape[1])
+    ref_index.add(ref_chunks)
+    cand_index = faiss.IndexFlatL2(cand_chunks.shape[1])
+    cand_index.add(cand_chunks)
+    _, ref_top = ref_index.search(ref_queries, k)
+    _, cand_top = cand_index.search(cand_queries, k)
+    overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(ref_top, cand_top)])
+
+    print(f"{len(chunks)} chunks, {len(QUERIES)} queries, top-{k}")
+    print(f"{reference.name}: {ref_time * 1000:.1f} ms   {candidate.name}: {cand_time * 1000:.1f} ms")
+    print(f"cosine similarity: min {cosine.min():.4f} mean {cosine.mean():.4f}")
+    print(f"top-{k} overlap: {overlap:.3f}")
+
+    if cosine.min() < args.min_cosine or overlap < args.min_overlap:
+        print("FAIL: candidate encoder is outside tolerance")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import os
+import threading
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+
+class Encoder:
+    """Common interface for embedding backends.
+
+    Mirrors the subset of ``SentenceTransformer`` that RAGSystem uses. The
+    underlying model is loaded on the first call that needs it, so a
+    worker that only serves cached vectors never pays for it.
+    """
+
+    # Goes into every cache key; backends whose vectors differ must differ here
+    name = MODEL_NAME
+
+    def __init__(self):
+        self._loaded = None
+        self._load_lock = threading.Lock()
+
+    def _load(self):
+        raise NotImplementedError
+
+    @property
+    def loaded(self):
+        if self._loaded is None:
+            with self._load_lock:
+                if self._loaded is None:
+                    self._loaded = self._load()
+        return self._loaded
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32, normalize_embeddings: bool = False,
+               **kwargs) -> np.ndarray:
+        raise NotImplementedError
+
+    def get_sentence_embedding_dimension(self) -> int:
+        raise NotImplementedError
+
+
+class SentenceTransformerEncoder(Encoder):
+    """The fp32 PyTorch model via sentence-transformers (imported lazily)."""
+
+    def __init__(self, model_name: str = MODEL_NAME):
+        super().__init__()
+        self.model_name = model_name
+        self.name = model_name
+
+    def _load(self):
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(self.model_name)
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=False, **kwargs):
+        return self.loaded.encode(list(texts), batch_size=batch_size,
+                                  normalize_embeddings=normalize_embeddings,
+                                  show_progress_bar=False, convert_to_numpy=True)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.loaded.get_sentence_embedding_dimension()
+
+
+class OnnxEncoder(Encoder):
+    """MiniLM exported to ONNX (optionally int8-quantized), run with onnxruntime.
+
+    ``model_dir`` holds ``model.onnx`` and/or ``model_quantized.onnx`` plus
+    the fast-tokenizer ``tokenizer.json``, as written by ``Rag.export_onnx``.
+    Needs only onnxruntime and tokenizers at runtime, not torch.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = True, max_length: int = 256,
+                 threads: Optional[int] = None):
+        super().__init__()
+        self.model_dir = Path(model_dir)
+        self.quantized = quantized
+        self.max_length = max_length
+        self.threads = threads
+        # "-l2": earlier versions cached un-normalized vectors under the bare name
+        self.name = f"{MODEL_NAME}:onnx-{'int8' if quantized else 'fp32'}-l2"
+
+    def _load(self):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_file = self.model_dir / ("model_quantized.onnx" if self.quantized else "model.onnx")
+        options = ort.SessionOptions()
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+        session = ort.InferenceSession(str(model_file), options, providers=["CPUExecutionProvider"])
+
+        tokenizer = Tokenizer.from_file(str(self.model_dir / "tokenizer.json"))
+        tokenizer.enable_truncation(max_length=self.max_length)
+        tokenizer.enable_padding()
+        input_names = {i.name for i in session.get_inputs()}
+        return session, tokenizer, input_names
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=False, **kwargs):
+        session, tokenizer, input_names = self.loaded
+        texts = list(texts)
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            encodings = tokenizer.encode_batch(texts[start:start + batch_size])
+            mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": mask,
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            hidden = session.run(None, {k: v for k, v in feeds.items() if k in input_names})[0]
+            if hidden.ndim == 3:
+                # Mean pooling over real tokens, as in the sentence-transformers config
+                weights = mask[:, :, None].astype(np.float32)
+                hidden = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+            outputs.append(hidden.astype(np.float32))
+
+        if not outputs:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        # all-MiniLM-L6-v2 ends with a Normalize module, so the reference model always returns unit vectors
+        vectors = np.vstack(outputs)
+        vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors
+
+    def get_sentence_embedding_dimension(self) -> int:
+        session = self.loaded[0]
+        return session.get_outputs()[0].shape[-1]
+
+
+def get_encoder(backend: Optional[str] = None) -> Encoder:
+    """Encoder selected by RAG_ENCODER: ``torch`` (default) or ``onnx``."""
+    backend = backend or os.environ.get("RAG_ENCODER", "torch")
+    if backend == "torch":
+        return SentenceTransformerEncoder(MODEL_NAME)
+    if backend == "onnx":
+        model_dir = os.environ.get("RAG_ONNX_MODEL_DIR", str(Path(__file__).parent / "models" / "minilm-onnx"))
+        threads = os.environ.get("RAG_ONNX_THREADS")
+        return OnnxEncoder(
+            model_dir,
+            quantized=os.environ.get("RAG_ONNX_QUANTIZED", "1") != "0",
+            threads=int(threads) if threads else None,
+        )
+    raise ValueError(f"Unknown encoder backend {backend!r}; expected 'torch' or 'onnx'")
@@ -0,0 +1,55 @@
+"""Export MiniLM to ONNX and an int8 dynamically-quantized copy.
+
+One-off, offline step (needs torch + sentence-transformers + onnxruntime).
+Run from ``backend/``:
+
+    python -m Rag.export_onnx --output Rag/models/minilm-onnx
+
+Then serve with ``RAG_ENCODER=onnx RAG_ONNX_MODEL_DIR=Rag/models/minilm-onnx``
+and check retrieval parity with ``python -m Rag.encoder_parity``.
+"""
+import argparse
+from pathlib import Path
+
+from .encoders import MODEL_NAME
+
+
+def export(output: Path, opset: int = 14) -> None:
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    output.mkdir(parents=True, exist_ok=True)
+    model = SentenceTransformer(MODEL_NAME, device="cpu")
+    transformer = model[0].auto_model.eval()
+    model.tokenizer.save_pretrained(str(output))
+
+    sample = model.tokenizer(["an example statement row"], return_tensors="pt")
+    inputs = (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"])
+    axes = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            inputs,
+            str(output / "model.onnx"),
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={"input_ids": axes, "attention_mask": axes, "token_type_ids": axes,
+                          "last_hidden_state": axes},
+            opset_version=opset,
+        )
+    quantize_dynamic(str(output / "model.onnx"), str(output / "model_quantized.onnx"),
+                     weight_type=QuantType.QInt8)
+    print(f"Wrote {output / 'model.onnx'} and {output / 'model_quantized.onnx'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default=str(Path(__file__).parent / "models" / "minilm-onnx"))
+    parser.add_argument("--opset", type=int, default=14)
+    args = parser.parse_args()
+    export(Path(args.output), args.opset)
+
+
+if __name__ == "__main__":
+    main()
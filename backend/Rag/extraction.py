@@ -0,0 +1,53 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, TypeVar
+
+from PyPDF2 import PdfReader
+
+T = TypeVar("T")
+
+
+def _extract_range(pdf_path: str, start: int, stop: int) -> List[str]:
+    # Runs in a worker process: each worker parses the PDF on its own
+    reader = PdfReader(pdf_path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def iter_pages(pdf_path: str, workers: Optional[int] = None, pages_per_task: int = 8) -> Iterator[str]:
+    """Yield each page's extracted text, in order.
+
+    With ``workers`` > 1 (default: RAG_EXTRACT_WORKERS), page ranges are
+    extracted in a process pool. At most ``2 * workers`` ranges are in
+    flight, so memory is bounded however far the consumer lags behind.
+    """
+    if workers is None:
+        workers = int(os.environ.get("RAG_EXTRACT_WORKERS", 1))
+    reader = PdfReader(pdf_path)
+    page_count = len(reader.pages)
+
+    if workers <= 1 or page_count <= pages_per_task:
+        for page in reader.pages:
+            yield page.extract_text() or ""
+        return
+
+    ranges = iter([(start, min(start + pages_per_task, page_count))
+                   for start in range(0, page_count, pages_per_task)])
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque(pool.submit(_extract_range, pdf_path, *r) for r in islice(ranges, 2 * workers))
+        while pending:
+            texts = pending.popleft().result()
+            following = next(ranges, None)
+            if following:
+                pending.append(pool.submit(_extract_range, pdf_path, *following))
+            yield from texts
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,10 @@
+import hashlib
+
+
+def file_hash(path: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's contents, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
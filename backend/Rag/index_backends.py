@@ -0,0 +1,231 @@
+import json
+import math
+import os
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+import faiss
+
+INDEX_KINDS = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+INDEX_FILE = "index.faiss"
+STATE_FILE = "index.json"
+
+
+class IndexConfig:
+    """Which FAISS structure backs a corpus, and its search knobs.
+
+    Every corpus starts as an exact flat index; once it holds
+    ``train_threshold`` vectors it is migrated to ``kind``. IVF indexes are
+    retrained whenever the corpus has grown ``retrain_factor`` times since
+    the last training, so centroids keep up with the data.
+    """
+
+    def __init__(self, kind: str = "flat", nlist: Optional[int] = None, nprobe: int = 8,
+                 hnsw_m: int = 32, ef_construction: int = 80, ef_search: int = 64,
+                 pq_m: int = 48, pq_bits: int = 8, train_threshold: int = 20000,
+                 retrain_factor: float = 4.0):
+        if kind not in INDEX_KINDS:
+            raise ValueError(f"Unknown index kind {kind!r}; expected one of {', '.join(INDEX_KINDS)}")
+        self.kind = kind
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.pq_m = pq_m
+        self.pq_bits = pq_bits
+        self.train_threshold = train_threshold
+        self.retrain_factor = retrain_factor
+
+    @classmethod
+    def from_env(cls) -> "IndexConfig":
+        env = os.environ
+        nlist = env.get("RAG_INDEX_NLIST")
+        return cls(
+            kind=env.get("RAG_INDEX_KIND", "flat"),
+            nlist=int(nlist) if nlist else None,
+            nprobe=int(env.get("RAG_INDEX_NPROBE", 8)),
+            hnsw_m=int(env.get("RAG_INDEX_HNSW_M", 32)),
+            ef_construction=int(env.get("RAG_INDEX_EF_CONSTRUCTION", 80)),
+            ef_search=int(env.get("RAG_INDEX_EF_SEARCH", 64)),
+            pq_m=int(env.get("RAG_INDEX_PQ_M", 48)),
+            pq_bits=int(env.get("RAG_INDEX_PQ_BITS", 8)),
+            train_threshold=int(env.get("RAG_INDEX_TRAIN_THRESHOLD", 20000)),
+            retrain_factor=float(env.get("RAG_INDEX_RETRAIN_FACTOR", 4.0)),
+        )
+
+    def __repr__(self) -> str:
+        return (f"IndexConfig(kind={self.kind!r}, nlist={self.nlist}, nprobe={self.nprobe}, "
+                f"hnsw_m={self.hnsw_m}, ef_construction={self.ef_construction}, ef_search={self.ef_search}, "
+                f"pq_m={self.pq_m}, pq_bits={self.pq_bits}, train_threshold={self.train_threshold}, "
+                f"retrain_factor={self.retrain_factor})")
+
+
+def _nlist_for(n: int, configured: Optional[int]) -> int:
+    if configured:
+        return configured
+    # ~4*sqrt(n) lists, but never fewer than 39 training points per centroid
+    return max(1, min(int(4 * math.sqrt(n)), n // 39))
+
+
+def _pq_m_for(dimension: int, configured: int) -> int:
+    # PQ needs the sub-quantizer count to divide the dimension
+    m = min(configured, dimension)
+    while dimension % m:
+        m -= 1
+    return m
+
+
+class VectorIndex:
+    """Id-addressed vector index with a swappable FAISS backend.
+
+    Ids are caller-chosen int64s (RAGSystem uses chunk text hashes).
+    Supports add, remove, reconstruct and filtered search on every kind;
+    HNSW cannot delete in place, so removals there are tombstoned and
+    excluded at search time until the next rebuild.
+    """
+
+    def __init__(self, dimension: int, config: Optional[IndexConfig] = None):
+        self.d = dimension
+        self.config = config or IndexConfig()
+        self.kind = "flat"
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(dimension))
+        self.trained_at = 0
+        self._deleted = set()
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal - len(self._deleted)
+
+    def __len__(self) -> int:
+        return self.ntotal
+
+    def add(self, vectors: np.ndarray, ids: np.ndarray) -> None:
+        ids = np.asarray(ids, dtype=np.int64)
+        if self._deleted:
+            # Re-adding a tombstoned id: drop the stale copy first
+            revived = [i for i in ids.tolist() if i in self._deleted]
+            if revived:
+                self._rebuild(self.kind)
+        self.index.add_with_ids(np.ascontiguousarray(vectors, dtype=np.float32), ids)
+        self._maybe_train()
+
+    def remove(self, ids: Iterable[int]) -> None:
+        ids = np.fromiter(ids, dtype=np.int64)
+        if not len(ids):
+            return
+        if self.kind == "hnsw":
+            self._deleted.update(ids.tolist())
+            if len(self._deleted) > self.index.ntotal // 4:
+                self._rebuild("hnsw")
+        elif self.kind == "flat":
+            self.index.remove_ids(faiss.IDSelectorBatch(ids))
+        else:
+            # The IVF hashtable direct map only accepts array selectors
+            self.index.remove_ids(faiss.IDSelectorArray(ids))
+
+    def write(self, directory: Path) -> None:
+        """Serialize the FAISS index and the state around it into ``directory``."""
+        directory = Path(directory)
+        faiss.write_index(self.index, str(directory / INDEX_FILE))
+        with open(directory / STATE_FILE, "w") as f:
+            json.dump({"dimension": self.d, "kind": self.kind, "trained_at": self.trained_at,
+                       "deleted": sorted(self._deleted)}, f)
+
+    @classmethod
+    def read(cls, directory: Path, config: Optional[IndexConfig] = None) -> "VectorIndex":
+        """Load an index saved by ``write``, with its training intact."""
+        directory = Path(directory)
+        with open(directory / STATE_FILE) as f:
+            state = json.load(f)
+        vector_index = cls(state["dimension"], config)
+        vector_index.index = faiss.read_index(str(directory / INDEX_FILE))
+        vector_index.kind = state["kind"]
+        vector_index.trained_at = state["trained_at"]
+        vector_index._deleted = set(state["deleted"])
+        return vector_index
+
+    def reconstruct(self, vector_id: int) -> np.ndarray:
+        """Stored vector for an id. Approximate for ivf_pq."""
+        return self.index.reconstruct(int(vector_id))
+
+    def search(self, queries: np.ndarray, k: int, allowed_ids: Optional[Iterable[int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        # SWIG selectors hold raw pointers to each other, so every piece is
+        # kept referenced until the search returns
+        keepalive = []
+        sel = None
+        if allowed_ids is not None:
+            sel = faiss.IDSelectorBatch(np.fromiter(allowed_ids, dtype=np.int64))
+            keepalive.append(sel)
+        if self._deleted:
+            deleted = faiss.IDSelectorBatch(np.fromiter(self._deleted, dtype=np.int64))
+            live = faiss.IDSelectorNot(deleted)
+            keepalive.extend([deleted, live])
+            sel = faiss.IDSelectorAnd(sel, live) if sel is not None else live
+
+        if self.kind in ("ivf_flat", "ivf_pq"):
+            params = faiss.SearchParametersIVF(nprobe=self.config.nprobe)
+        elif self.kind == "hnsw":
+            params = faiss.SearchParametersHNSW(efSearch=self.config.ef_search)
+        else:
+            params = faiss.SearchParameters()
+        if sel is not None:
+            params.sel = sel
+        return self.index.search(np.ascontiguousarray(queries, dtype=np.float32), k, params=params)
+
+    def _export(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self.kind in ("flat", "hnsw"):
+            ids = faiss.vector_to_array(self.index.id_map)
+            vectors = self.index.index.reconstruct_n(0, self.index.ntotal)
+        else:
+            # For ivf_pq these are the decoded (approximate) vectors
+            invlists = self.index.invlists
+            ids = np.concatenate([
+                faiss.rev_swig_ptr(invlists.get_ids(l), invlists.list_size(l)).copy()
+                for l in range(self.index.nlist)
+            ]) if self.index.ntotal else np.zeros(0, dtype=np.int64)
+            vectors = np.vstack([self.index.reconstruct(int(i)) for i in ids]) if len(ids) else np.zeros((0, self.d), np.float32)
+        if self._deleted:
+            keep = ~np.isin(ids, np.fromiter(self._deleted, dtype=np.int64))
+            ids, vectors = ids[keep], vectors[keep]
+        return vectors, ids
+
+    def _maybe_train(self) -> None:
+        target = self.config.kind
+        n = self.ntotal
+        threshold = self.config.train_threshold
+        if target == "ivf_pq":
+            # Each PQ codebook needs at least 2**bits training points
+            threshold = max(threshold, 1 << self.config.pq_bits)
+        if target == "flat" or n < threshold:
+            return
+        if self.kind == "flat" or (target != "hnsw" and n >= self.trained_at * self.config.retrain_factor):
+            self._rebuild(target)
+
+    def _rebuild(self, kind: str) -> None:
+        vectors, ids = self._export()
+        n = len(ids)
+        if kind == "hnsw":
+            inner = faiss.IndexHNSWFlat(self.d, self.config.hnsw_m)
+            inner.hnsw.efConstruction = self.config.ef_construction
+            index = faiss.IndexIDMap2(inner)
+        elif kind in ("ivf_flat", "ivf_pq"):
+            nlist = _nlist_for(n, self.config.nlist)
+            quantizer = faiss.IndexFlatL2(self.d)
+            if kind == "ivf_flat":
+                index = faiss.IndexIVFFlat(quantizer, self.d, nlist)
+            else:
+                index = faiss.IndexIVFPQ(quantizer, self.d, nlist, _pq_m_for(self.d, self.config.pq_m), self.config.pq_bits)
+            index.train(vectors)
+            # Lets reconstruct/remove address arbitrary 63-bit ids
+            index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        else:
+            index = faiss.IndexIDMap2(faiss.IndexFlatL2(self.d))
+        if n:
+            index.add_with_ids(vectors, ids)
+        self.index = index
+        self.kind = kind
+        self.trained_at = n
+        self._deleted = set()
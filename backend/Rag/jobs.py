@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, Optional
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class Job:
+    """One background task with a progress dict that watchers can poll or wait on."""
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = QUEUED
+        self.progress: Dict[str, Any] = {}
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.version = 0
+        self._changed = threading.Condition()
+
+    def update(self, **progress) -> None:
+        with self._changed:
+            self.progress.update(progress)
+            self.version += 1
+            self._changed.notify_all()
+
+    def _finish(self, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        with self._changed:
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished = time.time()
+            self.version += 1
+            self._changed.notify_all()
+
+    @property
+    def done(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def wait_for_change(self, version: int, timeout: float) -> int:
+        """Block until the job moves past ``version`` (or timeout); returns the current version."""
+        with self._changed:
+            if self.version == version and not self.done:
+                self._changed.wait(timeout)
+            return self.version
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        version = -1
+        while not self.done:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            version = self.wait_for_change(version, remaining if remaining is not None else 1.0)
+        return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._changed:
+            return {"job_id": self.id, "kind": self.kind, "status": self.status,
+                    "progress": dict(self.progress), "error": self.error, "version": self.version}
+
+    def events(self, heartbeat: float = 15.0) -> Iterator[Dict[str, Any]]:
+        """Yield a snapshot on every change until the job finishes."""
+        version = -1
+        while True:
+            current = self.wait_for_change(version, heartbeat)
+            snapshot = self.snapshot()
+            if current != version:
+                version = current
+                yield snapshot
+            if snapshot["status"] in (DONE, FAILED):
+                return
+
+
+class JobQueue:
+    """In-process job queue served by a small worker pool.
+
+    Heavy uploads run here so request threads stay free for interactive
+    calls. Finished jobs are kept for ``ttl`` seconds for polling.
+    """
+
+    def __init__(self, workers: int = 2, ttl: float = 3600.0):
+        self.ttl = ttl
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload-job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        return cls(
+            workers=int(os.environ.get("UPLOAD_WORKERS", 2)),
+            ttl=float(os.environ.get("JOB_TTL_SECONDS", 3600)),
+        )
+
+    def submit(self, kind: str, fn: Callable[[Job], Any]) -> Job:
+        """Run ``fn(job)`` on a worker; its return value becomes ``job.result``."""
+        job = Job(kind)
+        with self._lock:
+            now = time.time()
+            for job_id in [j.id for j in self._jobs.values() if j.finished and now - j.finished > self.ttl]:
+                del self._jobs[job_id]
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    @staticmethod
+    def _run(job: Job, fn: Callable[[Job], Any]) -> None:
+        job.status = RUNNING
+        job.update(stage="started")
+        try:
+            job._finish(DONE, result=fn(job))
+        except Exception as e:
+            print(f"Job {job.id} ({job.kind}) failed: {e}")
+            job._finish(FAILED, error=str(e))
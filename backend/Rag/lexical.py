@@ -0,0 +1,112 @@
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Candidates taken from each retriever before rank fusion
+FUSION_DEPTH = 10
+# BM25 idf above which a query term counts as specific (roughly: in <10% of chunks)
+RARE_TERM_IDF = 2.0
+
+STOPWORDS = {
+    "a", "an", "and", "are", "at", "by", "did", "do", "for", "from", "how", "i", "in", "is", "it",
+    "me", "much", "my", "of", "on", "or", "show", "the", "this", "to", "was", "what", "when",
+    "where", "which", "who", "with", "rs", "inr",
+}
+
+_TOKEN = re.compile(r"[a-z]+|\d+(?:[,./:-]\d+)*")
+_DATE = re.compile(r"^(\d{1,2})[/-](\d{1,2})(?:[/-](\d{2,4}))?$")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased words and numbers, with extra tokens for date/amount lookups.
+
+    ``12/03/2024`` also yields ``12/03`` so "on 12/03" matches a full date,
+    and ``1,234.00`` yields ``1234.00`` and ``1234``.
+    """
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if not token[0].isdigit():
+            tokens.append(token)
+            continue
+        date = _DATE.match(token)
+        if date:
+            day, month = int(date.group(1)), int(date.group(2))
+            tokens.append(f"{day:02d}/{month:02d}")
+            if date.group(3):
+                tokens.append(f"{day:02d}/{month:02d}/{date.group(3)}")
+            continue
+        amount = token.replace(",", "")
+        tokens.append(amount)
+        if re.fullmatch(r"\d+\.\d+", amount):
+            tokens.append(amount.split(".")[0])
+    return tokens
+
+
+class BM25Index:
+    """In-memory inverted index with Okapi BM25 scoring, keyed by chunk id."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.lengths: Dict[int, int] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def add(self, doc_id: int, text: str) -> None:
+        if doc_id in self.lengths:
+            return
+        counts = Counter(tokenize(text))
+        self.lengths[doc_id] = sum(counts.values())
+        self.total_length += self.lengths[doc_id]
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+
+    def remove(self, doc_id: int, text: str) -> None:
+        if doc_id not in self.lengths:
+            return
+        self.total_length -= self.lengths.pop(doc_id)
+        for term in set(tokenize(text)):
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.lengths) - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int, allowed: Optional[Set[int]] = None) -> List[Tuple[int, float]]:
+        if not self.lengths:
+            return []
+        avgdl = self.total_length / len(self.lengths)
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = self.idf(term)
+            for doc_id, tf in posting.items():
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                norm = tf + self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def covers(self, doc_id: int, terms: Iterable[str]) -> bool:
+        return all(doc_id in self.postings.get(term, ()) for term in terms)
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[int]], k: int, c: int = 60) -> List[Tuple[int, float]]:
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (c + rank + 1)
+    return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
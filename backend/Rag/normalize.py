@@ -0,0 +1,76 @@
+from typing import Dict, Tuple
+
+import pandas as pd
+
+# Optional sign/paren, optional currency, digits with any grouping, optional Dr/Cr suffix.
+# Covers "₹1,23,456.00", "INR 500", "(1,200.50)", "-$45", "Rs.-300", "2,000.00 Dr".
+_AMOUNT = (r"^\s*(?P<open>\()?\s*(?P<sign>[-−])?\s*(?:₹|RS\.?|INR|\$|USD)?\s*(?P<sign2>[-−])?\s*"
+           r"(?P<number>\d[\d,]*(?:\.\d+)?|\.\d+)\s*\)?\s*(?P<drcr>DR|CR)?\.?\s*$")
+
+# float32 keeps every value below 2**17 recoverable to the paisa/cent
+_FLOAT32_LIMIT = 2 ** 17
+
+SIGNED_AMOUNT_COLUMN = "amount"
+
+
+def parse_amounts(values: pd.Series) -> pd.Series:
+    """Parse formatted amounts in one vectorized regex pass; unparseable cells become NaN."""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype("float64")
+    parts = values.astype(str).str.upper().str.extract(_AMOUNT)
+    amounts = pd.to_numeric(parts["number"].str.replace(",", "", regex=False), errors="coerce")
+    negative = parts["open"].notna() | parts["sign"].notna() | parts["sign2"].notna() | (parts["drcr"] == "DR")
+    return amounts.mask(negative, -amounts)
+
+
+def compact_amounts(amounts: pd.Series) -> pd.Series:
+    """Downcast to float32 when that is lossless at two decimals, else keep float64."""
+    largest = amounts.abs().max()
+    if pd.notna(largest) and largest < _FLOAT32_LIMIT:
+        return amounts.astype("float32")
+    return amounts
+
+
+def signed_amounts(df: pd.DataFrame, detected_format: Dict) -> pd.Series:
+    """Signed amounts from the detected columns: credit minus debit when split, else the amount column."""
+    debit_col = detected_format.get("debit_column")
+    credit_col = detected_format.get("credit_column")
+    if debit_col and credit_col:
+        debit = parse_amounts(df[debit_col]).abs().fillna(0.0)
+        credit = parse_amounts(df[credit_col]).abs().fillna(0.0)
+        amounts = credit - debit
+        # Rows with neither side filled stay missing rather than becoming zero
+        return amounts.mask(df[debit_col].isna() & df[credit_col].isna())
+    return parse_amounts(df[detected_format["amount_column"]])
+
+
+def normalize_transactions(df: pd.DataFrame, detected_format: Dict) -> Tuple[pd.DataFrame, Dict]:
+    """One-time ingestion pass: signed compact amounts, parsed dates and downcast numerics.
+
+    Split debit/credit exports gain a single signed ``amount`` column, and the
+    returned format points ``amount_column`` at it.
+    """
+    detected_format = dict(detected_format)
+    if detected_format.get("amount_column"):
+        amounts = compact_amounts(signed_amounts(df, detected_format))
+        if detected_format.get("debit_column") and detected_format.get("credit_column"):
+            column = SIGNED_AMOUNT_COLUMN
+            while column in df.columns:
+                column = f"signed_{column}"
+            df[column] = amounts
+            detected_format["amount_column"] = column
+        else:
+            df[detected_format["amount_column"]] = amounts
+
+    date_col = detected_format.get("date_column")
+    if date_col and not pd.api.types.is_datetime64_any_dtype(df[date_col]):
+        dates = pd.to_datetime(df[date_col], errors="coerce")
+        if dates.notna().any():
+            df[date_col] = dates
+
+    # Integer columns (reference numbers, counts) shrink losslessly; other floats are left alone
+    for column in df.columns:
+        if pd.api.types.is_integer_dtype(df[column]):
+            df[column] = pd.to_numeric(df[column], downcast="integer")
+
+    return df, detected_format
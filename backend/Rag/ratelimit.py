@@ -0,0 +1,54 @@
+import os
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at ``per_minute / 60`` per second."""
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst if burst is not None else per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, cost: float = 1.0) -> float:
+        """Block until ``cost`` tokens are available; returns seconds waited."""
+        cost = min(cost, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return waited
+                delay = (cost - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class RateLimiter:
+    """Provider quota as two buckets: requests/minute and tokens/minute."""
+
+    def __init__(self, requests_per_minute: float = 30, tokens_per_minute: float = 6000):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        return cls(
+            requests_per_minute=float(os.environ.get("LLM_REQUESTS_PER_MINUTE", 30)),
+            tokens_per_minute=float(os.environ.get("LLM_TOKENS_PER_MINUTE", 6000)),
+        )
+
+    def acquire(self, estimated_tokens: int) -> float:
+        return self.requests.acquire() + self.tokens.acquire(estimated_tokens)
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English/transaction text
+    return len(text) // 4 + 1
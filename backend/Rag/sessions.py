@@ -0,0 +1,85 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional
+
+
+class UploadSession(NamedTuple):
+    """Processed state of one uploaded statement, shared read-only by follow-up calls."""
+    upload_id: str
+    content_hash: str
+    data: Any
+    detected_format: Dict
+    metrics: Any
+    summary: str
+    message: str
+    # LLM usage and tier counts from categorizing this upload
+    llm_metrics: Dict
+    categorization: Dict
+    created: float
+
+
+class SessionStore:
+    """In-memory upload results keyed by upload ID, with TTL and LRU eviction.
+
+    Re-uploading identical bytes maps to the existing session through the
+    content-hash index, so the file is processed at most once while its
+    session lives.
+    """
+
+    def __init__(self, ttl: float = 3600.0, max_sessions: int = 32):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, UploadSession]" = OrderedDict()
+        self._by_hash: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "SessionStore":
+        return cls(
+            ttl=float(os.environ.get("SESSION_TTL_SECONDS", 3600)),
+            max_sessions=int(os.environ.get("SESSION_MAX", 32)),
+        )
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def _expired(self, session: UploadSession) -> bool:
+        return time.time() - session.created > self.ttl
+
+    def _drop(self, upload_id: str) -> None:
+        session = self._sessions.pop(upload_id, None)
+        if session is not None and self._by_hash.get(session.content_hash) == upload_id:
+            del self._by_hash[session.content_hash]
+
+    def get(self, upload_id: str) -> Optional[UploadSession]:
+        with self._lock:
+            session = self._sessions.get(upload_id)
+            if session is None:
+                return None
+            if self._expired(session):
+                self._drop(upload_id)
+                return None
+            self._sessions.move_to_end(upload_id)
+            return session
+
+    def get_by_hash(self, digest: str) -> Optional[UploadSession]:
+        with self._lock:
+            upload_id = self._by_hash.get(digest)
+        return self.get(upload_id) if upload_id else None
+
+    def put(self, session: UploadSession) -> None:
+        with self._lock:
+            self._drop(session.upload_id)
+            self._sessions[session.upload_id] = session
+            self._by_hash[session.content_hash] = session.upload_id
+            for upload_id in [uid for uid, s in self._sessions.items() if self._expired(s)]:
+                self._drop(upload_id)
+            while len(self._sessions) > self.max_sessions:
+                self._drop(next(iter(self._sessions)))
+
+    def __len__(self) -> int:
+        return len(self._sessions)
@@ -0,0 +1,161 @@
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Sequence
+
+import numpy as np
+
+from .chunking import Chunk
+
+STORE_VERSION = 3
+
+# Raw float32 rows; the manifest records the dimension
+VECTORS_FILE = "vectors.f32"
+TEXT_FILE = "chunks.bin"
+CHUNKS_FILE = "chunks.npy"
+MANIFEST_FILE = "manifest.json"
+# Written next to a serialized corpus index (see RAGSystem.save_index)
+CORPUS_FILE = "corpus.json"
+
+# Per-chunk fixed-width record, stored as .npy so it can be memory-mapped.
+CHUNK_DTYPE = np.dtype([
+    ("offset", np.int64),
+    ("length", np.int64),
+    ("page", np.int32),
+    ("start", np.int64),
+    ("end", np.int64),
+])
+
+
+def default_cache_dir() -> Path:
+    return Path(os.environ.get("RAG_CACHE_DIR", Path(__file__).parent / ".rag_cache"))
+
+
+class ChunkStore(Sequence[Chunk]):
+    """Read-only chunk list backed by a memory-mapped text blob.
+
+    Chunks are decoded on access, so opening a store costs nothing
+    proportional to the corpus size.
+    """
+
+    def __init__(self, directory: Path):
+        self.records = np.load(directory / CHUNKS_FILE, mmap_mode="r")
+        text_path = directory / TEXT_FILE
+        if text_path.stat().st_size:
+            self.text = np.memmap(text_path, dtype=np.uint8, mode="r")
+        else:
+            self.text = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        record = self.records[i]
+        offset, length = record["offset"], record["length"]
+        text = self.text[offset:offset + length].tobytes().decode("utf-8")
+        return Chunk(text, int(record["page"]), int(record["start"]), int(record["end"]))
+
+    def __iter__(self) -> Iterator[Chunk]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+class StoreWriter:
+    """Writes a store batch by batch, so no document is held in memory whole.
+
+    Files are staged in a sibling temp dir and swapped in by ``commit``
+    with a rename, so concurrent workers never observe a half-written store.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.parent.mkdir(parents=True, exist_ok=True)
+        self.staging = Path(tempfile.mkdtemp(prefix=self.directory.name + ".", dir=self.directory.parent))
+        self._text = open(self.staging / TEXT_FILE, "wb")
+        self._vectors = open(self.staging / VECTORS_FILE, "wb")
+        self._records = []
+        self._offset = 0
+        self.count = 0
+        self.dimension = None
+
+    def append(self, chunks: Sequence[Chunk], vectors: np.ndarray) -> None:
+        encoded = [chunk.text.encode("utf-8") for chunk in chunks]
+        records = np.zeros(len(encoded), dtype=CHUNK_DTYPE)
+        records["page"] = [chunk.page for chunk in chunks]
+        records["start"] = [chunk.start for chunk in chunks]
+        records["end"] = [chunk.end for chunk in chunks]
+        lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+        records["length"] = lengths
+        records["offset"] = self._offset + np.cumsum(lengths) - lengths
+        for b in encoded:
+            self._text.write(b)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self._vectors.write(vectors.tobytes())
+        self._records.append(records)
+        self._offset += int(lengths.sum())
+        self.count += len(encoded)
+        self.dimension = vectors.shape[1]
+
+    def commit(self, manifest: Dict) -> None:
+        try:
+            self._close()
+            records = np.concatenate(self._records) if self._records else np.zeros(0, dtype=CHUNK_DTYPE)
+            np.save(self.staging / CHUNKS_FILE, records)
+            manifest = dict(manifest, version=STORE_VERSION, chunk_count=self.count, dimension=self.dimension)
+            with open(self.staging / MANIFEST_FILE, "w") as f:
+                json.dump(manifest, f, indent=2)
+
+            if self.directory.exists():
+                shutil.rmtree(self.directory, ignore_errors=True)
+            os.replace(self.staging, self.directory)
+        except Exception:
+            self.abort()
+            raise
+
+    def abort(self) -> None:
+        self._close()
+        shutil.rmtree(self.staging, ignore_errors=True)
+
+    def _close(self) -> None:
+        self._text.close()
+        self._vectors.close()
+
+
+def read_manifest(directory: Path) -> Optional[Dict]:
+    try:
+        with open(Path(directory) / MANIFEST_FILE) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != STORE_VERSION:
+        return None
+    return manifest
+
+
+def load_artifacts(directory: Path):
+    """Return (vectors, chunks, manifest) for a store written by StoreWriter.
+
+    ``vectors`` is memory-mapped, so callers can copy it out in batches.
+    """
+    directory = Path(directory)
+    manifest = read_manifest(directory)
+    if manifest is None:
+        raise FileNotFoundError(f"No valid RAG store at {directory}")
+    vectors_path = directory / VECTORS_FILE
+    if vectors_path.stat().st_size:
+        vectors = np.memmap(vectors_path, dtype=np.float32, mode="r").reshape(-1, manifest["dimension"])
+    else:
+        vectors = np.zeros((0, manifest["dimension"] or 0), dtype=np.float32)
+    chunks = ChunkStore(directory)
+    if len(chunks) != manifest["chunk_count"] or len(vectors) != len(chunks):
+        raise ValueError(f"RAG store at {directory} is inconsistent")
+    return vectors, chunks, manifest
+
+
+def manifest_matches(manifest: Optional[Dict], expected: Dict) -> bool:
+    return manifest is not None and all(manifest.get(k) == v for k, v in expected.items())
+
@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+TABLE_VERSION = 1
+
+
+def default_table_dir() -> Path:
+    return Path(os.environ.get("TABLE_CACHE_DIR", Path(__file__).parent / ".rag_cache" / "tables"))
+
+
+class TableCache:
+    """Processed transaction tables stored as Parquet, keyed by upload content hash.
+
+    The detected column format travels in the Parquet schema metadata, so
+    one file is the whole cache entry. Loads memory-map the file and read
+    only the requested columns. Without pyarrow the cache is a no-op.
+    """
+
+    def __init__(self, directory: Optional[Path] = None):
+        self.directory = Path(directory) if directory is not None else default_table_dir()
+        try:
+            import pyarrow  # noqa: F401
+            self.enabled = True
+        except ImportError:
+            print("pyarrow not installed; transaction table cache disabled")
+            self.enabled = False
+
+    def _path(self, digest: str) -> Path:
+        return self.directory / f"{digest}.parquet"
+
+    def save(self, digest: str, df, detected_format: Dict) -> None:
+        if not self.enabled:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            metadata = dict(table.schema.metadata or {})
+            metadata[b"finsee"] = json.dumps({"version": TABLE_VERSION, "format": detected_format}).encode()
+            table = table.replace_schema_metadata(metadata)
+
+            # Write to a temp file and rename so readers never see a partial table
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            os.close(fd)
+            pq.write_table(table, tmp)
+            os.replace(tmp, self._path(digest))
+        except Exception as e:
+            print(f"Error caching transaction table: {e}")
+
+    def load(self, digest: str, columns: Optional[Sequence[str]] = None) -> Optional[Tuple[object, Dict]]:
+        """Return ``(DataFrame, detected_format)`` or None on a miss."""
+        path = self._path(digest)
+        if not self.enabled or not path.exists():
+            return None
+        import pyarrow.parquet as pq
+
+        try:
+            schema = pq.read_schema(path)
+            info = json.loads((schema.metadata or {}).get(b"finsee", b"{}"))
+            if info.get("version") != TABLE_VERSION:
+                return None
+            detected_format = info["format"]
+            if columns is None:
+                columns = [c for c in (detected_format.get("date_column"), detected_format.get("amount_column"),
+                                       detected_format.get("description_column"), "category")
+                           if c and c in schema.names]
+            table = pq.read_table(path, columns=list(columns), memory_map=True)
+            return table.to_pandas(), detected_format
+        except Exception as e:
+            print(f"Error reading cached transaction table: {e}")
+            return None
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional
+
+DOCUMENTS_FILE = "documents.json"
+# The tenant's serialized FAISS index, so a reload does not rebuild or retrain it
+INDEX_DIR = "index"
+# Tenants share a fixed set of locks, so no lock is ever dropped while held
+LOCK_STRIPES = 64
+
+
+class TenantRegistry:
+    """Per-user RAG corpora with LRU eviction.
+
+    Each tenant's document list and FAISS index are persisted under
+    ``root``; chunks and raw vectors live in the shared per-document
+    stores, so an evicted tenant is reloaded from disk on its next request
+    without re-embedding or retraining (unless the embedding parameters
+    changed since; see ``RAGSystem.load_documents``).
+    """
+
+    def __init__(self, factory: Callable, root: Path, max_tenants: int = 32):
+        self.factory = factory
+        self.root = Path(root)
+        self.max_tenants = max_tenants
+        self._systems: "OrderedDict[str, object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._tenant_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    def _tenant_dir(self, tenant_id: str) -> Path:
+        # User ids are not trusted as path components
+        return self.root / hashlib.sha256(str(tenant_id).encode("utf-8")).hexdigest()[:32]
+
+    def _tenant_lock(self, tenant_id: str) -> threading.Lock:
+        return self._tenant_locks[hash(str(tenant_id)) % len(self._tenant_locks)]
+
+    def documents(self, tenant_id: str) -> List[str]:
+        try:
+            with open(self._tenant_dir(tenant_id) / DOCUMENTS_FILE) as f:
+                return json.load(f)["documents"]
+        except (OSError, ValueError, KeyError):
+            return []
+
+    def _write_documents(self, tenant_id: str, doc_ids: List[str]) -> None:
+        directory = self._tenant_dir(tenant_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = directory / (DOCUMENTS_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"tenant_id": str(tenant_id), "documents": doc_ids}, f)
+        os.replace(tmp_path, directory / DOCUMENTS_FILE)
+
+    def _remember(self, tenant_id: str, system) -> None:
+        with self._lock:
+            self._systems[tenant_id] = system
+            self._systems.move_to_end(tenant_id)
+            while len(self._systems) > self.max_tenants:
+                self._systems.popitem(last=False)
+
+    def evict(self, tenant_id: str) -> None:
+        with self._lock:
+            self._systems.pop(tenant_id, None)
+
+    def loaded(self) -> List[str]:
+        with self._lock:
+            return list(self._systems)
+
+    def get(self, tenant_id: str):
+        """Return the tenant's RAGSystem, reloading it from disk if evicted."""
+        with self._lock:
+            system = self._systems.get(tenant_id)
+            if system is not None:
+                self._systems.move_to_end(tenant_id)
+                return system
+
+        with self._tenant_lock(tenant_id):
+            return self._load(tenant_id)
+
+    def _load(self, tenant_id: str):
+        # Caller holds the tenant lock
+        with self._lock:
+            system = self._systems.get(tenant_id)
+        if system is not None:
+            return system
+
+        doc_ids = self.documents(tenant_id)
+        if not doc_ids:
+            return None
+        system = self.factory()
+        if not system.load_documents(doc_ids, self._tenant_dir(tenant_id) / INDEX_DIR):
+            return None
+        self._remember(tenant_id, system)
+        return system
+
+    def add_pdf(self, tenant_id: str, pdf_path: str) -> bool:
+        """Add a statement to the tenant's corpus, embedding only its new chunks."""
+        with self._tenant_lock(tenant_id):
+            # A corpus that fails to load is replaced in memory, but its saved documents are kept
+            system = self._load(tenant_id) or self.factory()
+            try:
+                system.add_documents([pdf_path])
+            except Exception as e:
+                print(f"Error loading PDF for tenant {tenant_id}: {e}")
+                return False
+            saved = self.documents(tenant_id)
+            self._write_documents(tenant_id, saved + [d for d in system.documents if d not in saved])
+            system.save_index(self._tenant_dir(tenant_id) / INDEX_DIR)
+            self._remember(tenant_id, system)
+            return True
+
+    def remove_document(self, tenant_id: str, doc_id: str) -> bool:
+        with self._tenant_lock(tenant_id):
+            saved = self.documents(tenant_id)
+            if doc_id not in saved:
+                return False
+            # Documents skipped at load time stay listed until removed here
+            system = self._load(tenant_id)
+            if system is not None:
+                system.remove_document(doc_id)
+                system.save_index(self._tenant_dir(tenant_id) / INDEX_DIR)
+            self._write_documents(tenant_id, [d for d in saved if d != doc_id])
+            return True
+
+    def get_relevant_chunks(self, tenant_id: str, query: str, k: int = 3,
+                            doc_ids: Optional[Iterable[str]] = None) -> List[str]:
+        system = self.get(tenant_id)
+        if system is None:
+            return []
+        return system.get_relevant_chunks(query, k, doc_ids=doc_ids)
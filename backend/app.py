@@ -1,12 +1,27 @@
-from flask import Flask, request, jsonify
-from groq import Groq
+from flask import Flask, jsonify
 from flask_cors import CORS
+from dotenv import load_dotenv
+from llm_gateway import get_gateway
+from intent_router import IntentRouter
+from onboarding import OnboardingFlow
+from endpoints import LLMCall, Reply, endpoint
+from streaming import wants_stream
 import json
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*", "methods": ["GET", "POST", "OPTIONS"]}})
 
-client = Groq(api_key="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")
+# GROQ_API_KEY may come from a .env file, as for advisor.py
+load_dotenv()
+
+# Every completion goes through the shared gateway (pooling, retries, cache, timings)
+llm = get_gateway()
+
+# Navigation commands are answered locally by keyword rules; the rest go to the LLM
+intent_router = IntentRouter.from_env()
+
+# Registration steps are parsed and validated locally; the LLM only sees input the flow cannot read
+onboarding_flow = OnboardingFlow.from_env()
 
 SYSTEM_PROMPT = """You are Finsee, a helpful and efficient banking assistant. Keep responses under 50 words.
 Always respond in this exact JSON format:
@@ -49,100 +64,91 @@ Always respond in this format:
     "next_instruction": "clear next step"
 }"""
 
-@app.route('/chat', methods=['POST'])
-def chat():
-    try:
-        user_message = request.json.get('message', '')
-        
-        completion = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_message}
-            ],
-            model="mistral-saba-24b",
-            temperature=0.7,
-            max_tokens=150,
-            top_p=1,
-            stream=False
-        )
-        
-        response = completion.choices[0].message.content
-        return jsonify({"status": "success", "data": json.loads(response)})
-    except Exception as e:
-        print(e)
-        return jsonify({"status": "error", "message": str(e)}), 500
-
-@app.route('/onboarding', methods=['POST'])
-def onboarding():
-    try:
-        data = request.json
-        current_step = data.get('currentStep', 'phone')
-        user_input = data.get('userInput', '')
-        form_data = data.get('formData', {})
-
-        completion = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": ONBOARDING_PROMPT},
-                {"role": "user", "content": f"Step: {current_step}, Input: {user_input}, Form: {json.dumps(form_data)}"}
-            ],
-            model="mistral-saba-24b",
-            temperature=0.7,
-            max_tokens=150,
-            top_p=1,
-            stream=False
-        )
-        
-        response = completion.choices[0].message.content
-        return jsonify({"status": "success", "data": json.loads(response)})
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
-
-@app.route('/process-voice', methods=['POST'])
-def process_voice():
-    try:
-        data = request.json
-        transcript = data.get('transcript', '').lower()
-        current_step = data.get('currentStep', '')
-        form_data = data.get('formData', {})
-
-        # Special handling for language selection
-        if current_step == 'language':
-            languages = ['english', 'hindi', 'telugu', 'tamil']
-            detected_language = next((lang for lang in languages if lang in transcript), None)
-            
-            if detected_language:
-                return jsonify({
-                    "status": "success",
-                    "data": {
-                        "intent": "language_selection",
-                        "step": "language",
-                        "value": detected_language,
-                        "confidence": "high",
-                        "needs_confirmation": True,
-                        "message": f"I heard you want to use {detected_language}. Is that correct?",
-                        "next_instruction": "Say yes to confirm or no to try again"
-                    }
-                })
-
-        # Process registration steps
-        completion = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": VOICE_ONBOARDING_PROMPT},
-                {"role": "user", "content": f"Step: {current_step}, Input: {transcript}, Previous: {json.dumps(form_data)}"}
-            ],
-            model="mistral-saba-24b",
-            temperature=0.3,
-            max_tokens=150
-        )
-        
-        result = json.loads(completion.choices[0].message.content)
-        return jsonify({"status": "success", "data": result})
-    except Exception as e:
-        print(f"Voice processing error: {str(e)}")
-        return jsonify({
-            "status": "error",
-            "message": "Could not process voice input"
-        }), 500
+def chat_error(e):
+    print(e)
+    return {"status": "error", "message": str(e)}, 500
+
+def onboarding_error(e):
+    return {"status": "error", "message": str(e)}, 500
+
+def voice_error(e):
+    print(f"Voice processing error: {str(e)}")
+    return {"status": "error", "message": "Could not process voice input"}, 500
+
+@endpoint(app, '/chat', error=chat_error, methods=['POST'])
+def chat(payload, accept):
+    user_message = payload.get('message', '')
+    stream = wants_stream(payload, accept)
+    match = intent_router.route(user_message)
+    if match is not None:
+        reply = match.as_response()
+        return Reply({"status": "success", "data": reply}, text=json.dumps(reply), stream=stream, field="response")
+
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_message}
+    ]
+    call = LLMCall(llm, "chat", dict(
+        messages=messages,
+        model="mistral-saba-24b",
+        temperature=0.7,
+        max_tokens=150,
+        top_p=1,
+        stream=False
+    ))
+    return Reply(call=call, done=lambda content: {"status": "success", "data": json.loads(content)},
+                 stream=stream, field="response")
+
+@endpoint(app, '/onboarding', error=onboarding_error, methods=['POST'])
+def onboarding(payload, accept):
+    current_step = payload.get('currentStep', 'phone')
+    user_input = payload.get('userInput', '')
+    form_data = payload.get('formData', {})
+
+    reply = onboarding_flow.text_reply(current_step, user_input)
+    if reply is not None:
+        return Reply({"status": "success", "data": reply})
+
+    call = LLMCall(llm, "onboarding", dict(
+        messages=[
+            {"role": "system", "content": ONBOARDING_PROMPT},
+            {"role": "user", "content": f"Step: {current_step}, Input: {user_input}, Form: {json.dumps(form_data)}"}
+        ],
+        model="mistral-saba-24b",
+        temperature=0.7,
+        max_tokens=150,
+        top_p=1,
+        stream=False
+    ))
+    return Reply(call=call, done=lambda content: {"status": "success", "data": json.loads(content)})
+
+@endpoint(app, '/process-voice', error=voice_error, methods=['POST'])
+def process_voice(payload, accept):
+    transcript = payload.get('transcript', '').lower()
+    current_step = payload.get('currentStep', '')
+    form_data = payload.get('formData', {})
+
+    # Language, spoken numbers and yes/no confirmations are handled without the LLM
+    reply = onboarding_flow.voice_reply(current_step, transcript, form_data)
+    if reply is not None:
+        return Reply({"status": "success", "data": reply})
+
+    # Input the flow could not parse
+    call = LLMCall(llm, "process-voice", dict(
+        messages=[
+            {"role": "system", "content": VOICE_ONBOARDING_PROMPT},
+            {"role": "user", "content": f"Step: {current_step}, Input: {transcript}, Previous: {json.dumps(form_data)}"}
+        ],
+        model="mistral-saba-24b",
+        temperature=0.3,
+        max_tokens=150
+    ))
+    return Reply(call=call, done=lambda content: {"status": "success", "data": json.loads(content)})
+
+@app.route('/llm-stats', methods=['GET'])
+def llm_stats():
+    return jsonify({"status": "success", "data": llm.stats(), "intent_router": intent_router.stats,
+                    "onboarding": onboarding_flow.stats})
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,145 @@
+"""Async (ASGI) serving mode for the Flask backends.
+
+    uvicorn asgi:app --workers 2                      # app.py
+    FINSEE_APP=new_app uvicorn asgi:app --workers 2   # new_app.py (RAG chat)
+    FINSEE_APP=advisor uvicorn asgi:app --workers 2   # Rag/advisor.py
+
+Endpoints registered with ``endpoints.endpoint`` (/chat, /onboarding,
+/process-voice, /api/advice, /api/question) run the same plan as their
+Flask view, but the LLM call is awaited on the gateway's async client,
+so one process holds thousands of in-flight LLM waits on its event loop
+instead of one thread each. Planning can be CPU-bound (embeddings, FAISS
+search, pandas processing) and runs on a pool of CPU_WORKERS threads.
+Every other route is served by the module's Flask app through a2wsgi on
+WSGI_WORKERS threads, so nothing changes for those clients.
+"""
+import asyncio
+import functools
+import importlib
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Dict
+
+from a2wsgi import WSGIMiddleware
+from werkzeug.exceptions import HTTPException
+
+from endpoints import EXTENSION, Endpoint, acomplete, aevents
+from streaming import SSE_HEADERS
+
+# Numpy, FAISS, tokenizers and pandas release the GIL, so threads are enough here
+cpu_pool = ThreadPoolExecutor(max_workers=int(os.environ.get("CPU_WORKERS", os.cpu_count() or 4)),
+                              thread_name_prefix="cpu")
+
+
+async def run_cpu(fn, *args, **kwargs):
+    """Run CPU-bound ``fn`` off the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(cpu_pool, functools.partial(fn, *args, **kwargs))
+
+
+async def _read_body(receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def _send_json(send, status: int, payload: Dict) -> None:
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                            (b"access-control-allow-origin", b"*")]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_events(send, receive, events: AsyncIterator[str]) -> None:
+    headers = [(b"content-type", b"text/event-stream"), (b"access-control-allow-origin", b"*")]
+    headers += [(k.lower().encode(), v.encode()) for k, v in SSE_HEADERS.items()]
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+
+    async def pump():
+        async for event in events:
+            await send({"type": "http.response.body", "body": event.encode("utf-8"), "more_body": True})
+
+    async def watch_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    # A client that hangs up cancels the stream, which closes the upstream completion
+    streaming = asyncio.ensure_future(pump())
+    disconnect = asyncio.ensure_future(watch_disconnect())
+    await asyncio.wait([streaming, disconnect], return_when=asyncio.FIRST_COMPLETED)
+    if not streaming.done():
+        streaming.cancel()
+        return
+    disconnect.cancel()
+    streaming.result()
+    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class ASGIApp:
+    """Serves a Flask app's registered endpoints natively and the rest through a2wsgi."""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.endpoints: Dict[str, Endpoint] = flask_app.extensions.get(EXTENSION, {})
+        self.fallback = WSGIMiddleware(flask_app, workers=int(os.environ.get("WSGI_WORKERS", 16)))
+
+    def _endpoint(self, scope):
+        # CORS preflights and everything unregistered stay with Flask
+        if scope["method"] == "OPTIONS":
+            return None
+        try:
+            name, _ = self.flask_app.url_map.bind("localhost").match(scope["path"], scope["method"])
+        except HTTPException:
+            return None
+        return self.endpoints.get(name)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+
+        endpoint = self._endpoint(scope)
+        if endpoint is None:
+            return await self.fallback(scope, receive, send)
+
+        body = await _read_body(receive)
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        try:
+            payload = json.loads(body or b"null") or {}
+            reply = await run_cpu(endpoint.plan, payload, headers.get("accept", ""))
+            if reply.stream:
+                return await _send_events(send, receive, aevents(reply))
+            result, status = await acomplete(reply)
+        except Exception as e:
+            if endpoint.error is None:
+                print(f"{scope['path']} error: {e}")
+                return await _send_json(send, 500, {"status": "error", "message": "Internal server error"})
+            result, status = endpoint.error(e)
+        await _send_json(send, status, result)
+
+
+def create_app(name: str = None) -> ASGIApp:
+    """ASGI app for ``app``, ``new_app`` or ``advisor`` (FINSEE_APP, default ``app``)."""
+    name = name or os.environ.get("FINSEE_APP", "app")
+    if name == "advisor":
+        # advisor.py imports its siblings by plain name, as when run from Rag/
+        sys.path.insert(0, str(Path(__file__).resolve().parent / "Rag"))
+    elif name not in ("app", "new_app"):
+        raise ValueError(f"Unknown FINSEE_APP: {name}")
+    return ASGIApp(importlib.import_module(name).app)
+
+
+app = create_app()
@@ -0,0 +1,148 @@
+"""Endpoint logic shared by the Flask views and the async server.
+
+Each LLM endpoint is written once as ``plan(payload, accept) -> Reply``:
+either a finished body, or one LLM call plus ``done``, which builds the
+body from the completion text. ``@endpoint`` registers the plan as a
+Flask view that runs the call on the gateway's blocking client; asgi.py
+finds the same plan in ``app.extensions`` and awaits the call on the
+async client instead.
+"""
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, NamedTuple, Optional, Tuple
+
+from flask import Response, jsonify, request
+
+from streaming import SSE_HEADERS, atext_events, text_events
+
+EXTENSION = "finsee.endpoints"
+# Ends a reply the word budget cut short
+TRUNCATED_MARK = "..."
+
+
+class LLMCall(NamedTuple):
+    llm: Any
+    route: str
+    # messages, model and sampling params for ``chat`` / ``stream_chat``
+    params: Dict[str, Any]
+    # Stop generating after this many words (the call is then always streamed)
+    max_words: Optional[int] = None
+
+
+class Reply(NamedTuple):
+    """An endpoint's answer.
+
+    Without ``call`` it is ``body`` (streamed as the single token ``text``);
+    with ``call`` the body is ``done(completion text)``.
+    """
+    body: Optional[Dict] = None
+    status: int = 200
+    call: Optional[LLMCall] = None
+    done: Optional[Callable[[str], Dict]] = None
+    stream: bool = False
+    # JSON string field to speak while streaming, when the model replies in JSON
+    field: Optional[str] = None
+    text: str = ""
+    # Streamed ahead of the completion; not passed to ``done``
+    prefix: str = ""
+    # Stream tokens on one line, for TTS
+    flatten: bool = False
+
+
+class Endpoint(NamedTuple):
+    plan: Callable[[Dict, str], Reply]
+    # error(exception) -> (body, status); None leaves the exception to the server
+    error: Optional[Callable[[Exception], Tuple[Dict, int]]]
+
+
+def _finish(reply: Reply, text: str, truncated: bool) -> Dict:
+    if truncated:
+        text = text.rstrip() + TRUNCATED_MARK
+    return reply.done(text)
+
+
+def _delta(reply: Reply, delta: str) -> str:
+    return delta.replace("\n", " ") if reply.flatten else delta
+
+
+def complete(reply: Reply) -> Tuple[Dict, int]:
+    """(body, status) for a non-streamed reply, calling the LLM if needed."""
+    call = reply.call
+    if call is None:
+        return reply.body, reply.status
+    if call.max_words is None:
+        return reply.done(call.llm.chat(call.route, **call.params)), 200
+    # The word budget ends generation early instead of cutting the reply afterwards
+    stream = call.llm.stream_chat(call.route, max_words=call.max_words, **call.params)
+    text = "".join(stream)
+    return _finish(reply, text, stream.truncated), 200
+
+
+async def acomplete(reply: Reply) -> Tuple[Dict, int]:
+    """``complete`` on the gateway's async client."""
+    call = reply.call
+    if call is None:
+        return reply.body, reply.status
+    if call.max_words is None:
+        return reply.done(await call.llm.achat(call.route, **call.params)), 200
+    stream = call.llm.stream_chat(call.route, max_words=call.max_words, **call.params)
+    text = "".join([delta async for delta in stream])
+    return _finish(reply, text, stream.truncated), 200
+
+
+def events(reply: Reply) -> Iterator[str]:
+    """SSE messages for a streamed reply."""
+    if reply.call is None:
+        return text_events([reply.text], lambda raw: reply.body, reply.field)
+    call = reply.call
+    stream = call.llm.stream_chat(call.route, max_words=call.max_words, **call.params)
+
+    def deltas():
+        if reply.prefix:
+            yield reply.prefix
+        for delta in stream:
+            yield _delta(reply, delta)
+
+    return text_events(deltas(), lambda raw: _finish(reply, raw[len(reply.prefix):], stream.truncated), reply.field)
+
+
+def aevents(reply: Reply) -> AsyncIterator[str]:
+    """``events`` on the gateway's async client."""
+    if reply.call is None:
+        async def once():
+            yield reply.text
+
+        return atext_events(once(), lambda raw: reply.body, reply.field)
+    call = reply.call
+    stream = call.llm.stream_chat(call.route, max_words=call.max_words, **call.params)
+
+    async def deltas():
+        if reply.prefix:
+            yield reply.prefix
+        async for delta in stream:
+            yield _delta(reply, delta)
+
+    return atext_events(deltas(), lambda raw: _finish(reply, raw[len(reply.prefix):], stream.truncated), reply.field)
+
+
+def endpoint(app, rule: str, error: Optional[Callable[[Exception], Tuple[Dict, int]]] = None, **options):
+    """Register ``plan(payload, accept)`` as the Flask view for ``rule``.
+
+    ``error`` answers any exception raised while planning or completing.
+    """
+    def register(plan: Callable[[Dict, str], Reply]):
+        def view():
+            try:
+                reply = plan(request.json or {}, request.headers.get('Accept', ''))
+                if reply.stream:
+                    return Response(events(reply), mimetype='text/event-stream', headers=SSE_HEADERS)
+                body, status = complete(reply)
+            except Exception as e:
+                if error is None:
+                    raise
+                body, status = error(e)
+            return jsonify(body), status
+
+        app.add_url_rule(rule, plan.__name__, view, **options)
+        app.extensions.setdefault(EXTENSION, {})[plan.__name__] = Endpoint(plan, error)
+        return plan
+
+    return register
@@ -0,0 +1,185 @@
+"""Local /chat intent router for navigation commands.
+
+Keyword rules first, then nearest neighbour over MiniLM embeddings of
+labelled example utterances when an encoder is supplied. Confident
+matches are answered from templates in the same JSON shape the LLM
+returns, in the language of the utterance; everything else (including
+scripts there are no templates for) falls back to the LLM.
+"""
+import os
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+ACTIONS = {
+    "greeting": "none",
+    "balance": "/screen/check-balance",
+    "transfer": "/screen/bank-transfer",
+    "scan_qr": "/screen/scan-qr",
+    "pay_phone": "/screen/pay-phone",
+    "pay_contacts": "/screen/pay-contacts",
+    "profile": "/screen/profile",
+}
+
+# Replies by language, matching SYSTEM_PROMPT's "respond in the user's language"
+RESPONSES = {
+    "en": {
+        "greeting": "Hello! I'm Finsee. You can check your balance, transfer money, scan a QR code or pay someone.",
+        "balance": "Opening your account balance.",
+        "transfer": "Opening bank transfer. Tell me who you'd like to send money to.",
+        "scan_qr": "Opening the QR scanner. Point your camera at the code.",
+        "pay_phone": "Opening pay by phone number. Please say the number.",
+        "pay_contacts": "Opening your contacts so you can choose who to pay.",
+        "profile": "Opening your profile.",
+    },
+    # Hindi in Devanagari
+    "hi": {
+        "greeting": "नमस्ते! मैं Finsee हूँ। आप बैलेंस देख सकते हैं, पैसे ट्रांसफर कर सकते हैं, QR कोड स्कैन कर सकते हैं या किसी को पेमेंट कर सकते हैं।",
+        "balance": "आपका अकाउंट बैलेंस खोल रहा हूँ।",
+        "transfer": "बैंक ट्रांसफर खोल रहा हूँ। बताइए किसे पैसे भेजने हैं।",
+        "scan_qr": "QR स्कैनर खोल रहा हूँ। कैमरा कोड की ओर रखिए।",
+        "pay_phone": "फ़ोन नंबर से पेमेंट खोल रहा हूँ। कृपया नंबर बोलिए।",
+        "pay_contacts": "आपके कॉन्टैक्ट्स खोल रहा हूँ, ताकि आप चुन सकें किसे पेमेंट करना है।",
+        "profile": "आपकी प्रोफ़ाइल खोल रहा हूँ।",
+    },
+    # Romanized Hindi (Hinglish)
+    "hi-Latn": {
+        "greeting": "Namaste! Main Finsee hoon. Aap balance dekh sakte hain, paise transfer kar sakte hain, QR code scan kar sakte hain ya kisi ko pay kar sakte hain.",
+        "balance": "Aapka account balance khol raha hoon.",
+        "transfer": "Bank transfer khol raha hoon. Bataiye kise paise bhejne hain.",
+        "scan_qr": "QR scanner khol raha hoon. Camera ko code ki taraf rakhiye.",
+        "pay_phone": "Phone number se payment khol raha hoon. Kripya number boliye.",
+        "pay_contacts": "Aapke contacts khol raha hoon, taaki aap chun sakein kise pay karna hai.",
+        "profile": "Aapki profile khol raha hoon.",
+    },
+}
+
+_DEVANAGARI = re.compile(r"[\u0900-\u097F]")
+# Letters beyond Latin Extended: a script with no templates above
+_OTHER_SCRIPT = re.compile(r"[^\W\d_\u0000-\u024F]")
+_HINGLISH = re.compile(r"\b(mera|meri|mere|mujhe|batao|bataiye|dikhao|kitna|kitne|hai|hain|karo|karna|"
+                       r"bhejo|bhejna|paise|paisa|kholo|se|ko|namaste|namaskar)\b")
+
+# Polite lead-ins and trailing words allowed around a command; anything else means it is not a bare command
+_LEAD = r"(?:(?:please|pls|can you|could you|i want to|i'd like to|i would like to|let me|go to|take me to)\s+)*"
+_TAIL = r"(?:\s+(?:please|now|for me|finsee))*"
+
+# Full command forms; a rule matches only when it covers the whole utterance
+RULES = [
+    ("greeting", r"(hi|hello|hey|namaste|namaskar|vanakkam|good (morning|afternoon|evening))( there)?"),
+    ("scan_qr", r"((scan|open)( the| a)? )?(qr|q r)( code)?( scanner)?|(scan|open)( the| a)? (code|scanner)|scan to pay"),
+    ("pay_phone", r"(pay|send money)( to| using| by| with)?( a)? (phone|mobile)( number)?|pay by number"),
+    ("pay_contacts", r"(pay|send money to)( a| someone from)?( my)? contacts?|(open )?(my )?contacts( to pay)?"),
+    ("transfer", r"(open |make a |do a )?(bank |money |fund )?transfer( money| funds)?|send money"),
+    ("balance", r"((check|show|tell|what('?s| is)|open)( me)? )?(my )?(account |bank )?balance|(मेरा )?बैलेंस"),
+    ("profile", r"((open|show)( me)? )?(my )?(profile|account details|settings)"),
+]
+_COMPILED_RULES = [(intent, re.compile(f"{_LEAD}(?:{pattern}){_TAIL}")) for intent, pattern in RULES]
+
+# Questions about past activity, status or costs need the LLM (and RAG), even if they mention "transfer" or "balance"
+_ANALYSIS_CUES = re.compile(r"\b(how much did|did i|how do|last (week|month|year)|spent|spend|spending|history|"
+                            r"statement|transactions?|why|advice|advise|save|saving|budget|cancel(led)?|status|"
+                            r"done|fees?|charges?)\b")
+
+EXAMPLES = {
+    "greeting": ["hi", "hello", "hey there", "good morning", "namaste", "hello finsee"],
+    "balance": ["check my balance", "what is my account balance", "how much money is in my account",
+                "show balance", "mera balance batao", "balance kitna hai", "tell me my bank balance"],
+    "transfer": ["transfer money", "send money to my friend", "bank transfer", "I want to transfer funds",
+                 "paise bhejo", "move money to another account"],
+    "scan_qr": ["scan qr code", "open the scanner", "scan to pay", "I want to scan a code", "qr se pay karna hai"],
+    "pay_phone": ["pay to a phone number", "pay using mobile number", "send money to a phone number",
+                  "pay by number"],
+    "pay_contacts": ["pay a contact", "pay someone from my contacts", "open contacts to pay", "pay my friend from contacts"],
+    "profile": ["open my profile", "show my account details", "go to settings", "my profile"],
+}
+
+
+def reply_language(text: str) -> Optional[str]:
+    """Key into RESPONSES for ``text``, or None when there are no templates for its script."""
+    if _DEVANAGARI.search(text):
+        return "hi"
+    if _OTHER_SCRIPT.search(text):
+        return None
+    return "hi-Latn" if _HINGLISH.search(text.lower()) else "en"
+
+
+class IntentMatch(NamedTuple):
+    intent: str
+    confidence: float
+    source: str
+    language: str = "en"
+
+    def as_response(self) -> Dict[str, str]:
+        return {"intent": self.intent, "response": RESPONSES[self.language][self.intent],
+                "action": ACTIONS[self.intent]}
+
+
+class IntentRouter:
+    def __init__(self, encoder=None, min_similarity: float = 0.75, min_margin: float = 0.05):
+        self.encoder = encoder
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        # (labels, vectors), published as one tuple so readers never see half of it
+        self._examples: Optional[Tuple[List[str], np.ndarray]] = None
+        self._lock = threading.Lock()
+        self.stats = {"rule": 0, "embedding": 0, "fallback": 0}
+
+    @classmethod
+    def from_env(cls, encoder=None) -> "IntentRouter":
+        return cls(
+            encoder,
+            min_similarity=float(os.environ.get("INTENT_MIN_SIMILARITY", 0.75)),
+            min_margin=float(os.environ.get("INTENT_MIN_MARGIN", 0.05)),
+        )
+
+    @staticmethod
+    def _unit(vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+    def _example_vectors(self) -> Tuple[List[str], np.ndarray]:
+        if self._examples is None:
+            with self._lock:
+                if self._examples is None:
+                    labels = [intent for intent, texts in EXAMPLES.items() for _ in texts]
+                    texts = [text for texts in EXAMPLES.values() for text in texts]
+                    self._examples = (labels, self._unit(self.encoder.encode(texts)))
+        return self._examples
+
+    def _nearest(self, text: str) -> Optional[IntentMatch]:
+        labels, examples = self._example_vectors()
+        scores = examples @ self._unit(self.encoder.encode([text]))[0]
+        best: Dict[str, float] = {}
+        for label, score in zip(labels, scores):
+            best[label] = max(best.get(label, -1.0), float(score))
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        intent, score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else -1.0
+        if score >= self.min_similarity and score - runner_up >= self.min_margin:
+            return IntentMatch(intent, score, "embedding")
+        return None
+
+    def route(self, text: str) -> Optional[IntentMatch]:
+        """Return a confident navigation intent for ``text``, or None to use the LLM."""
+        normalized = " ".join(text.lower().split())
+        language = reply_language(normalized)
+        if not normalized or language is None or _ANALYSIS_CUES.search(normalized):
+            self.stats["fallback"] += 1
+            return None
+        # Long utterances are questions or instructions, not navigation commands
+        if len(normalized.split()) <= 12:
+            command = normalized.strip(" !.?,")
+            for intent, pattern in _COMPILED_RULES:
+                if pattern.fullmatch(command):
+                    self.stats["rule"] += 1
+                    return IntentMatch(intent, 1.0, "rule", language)
+            if self.encoder is not None:
+                match = self._nearest(normalized)
+                if match is not None:
+                    self.stats["embedding"] += 1
+                    return match._replace(language=language)
+        self.stats["fallback"] += 1
+        return None
@@ -0,0 +1,467 @@
+"""Single entry point for every Groq chat completion in the backend.
+
+One pooled client per API key, request timeouts, retries with jittered
+backoff, a response cache for low-temperature calls, streamed replies
+with an early stop at a word budget, and per-route latency/token
+histograms. Sync callers (the Flask apps) and async callers (asgi.py)
+share the same cache and stats. Used by app.py, new_app.py,
+Rag/advisor.py and asgi.py.
+"""
+import asyncio
+import bisect
+import hashlib
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from groq import AsyncGroq, Groq
+
+RETRYABLE_STATUS = {408, 409, 429}
+LATENCY_BUCKETS_MS = (50, 100, 200, 350, 500, 750, 1000, 1500, 2500, 5000, 10000, 30000)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+# httpx/httpcore scans its whole pool on every request, so large pools are split into shards of this size
+POOL_SHARD_SIZE = 32
+
+
+class Histogram:
+    """Fixed-bucket histogram with approximate percentiles."""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return self.bounds[i] if i < len(self.bounds) else float("inf")
+        return float("inf")
+
+    def snapshot(self) -> Dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "buckets": {str(b): n for b, n in zip(self.bounds + ["+inf"], self.counts)},
+        }
+
+
+class RouteStats:
+    def __init__(self):
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.first_token_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.prompt_tokens = Histogram(TOKEN_BUCKETS)
+        self.completion_tokens = Histogram(TOKEN_BUCKETS)
+        self.calls = 0
+        self.cache_hits = 0
+        self.errors = 0
+        self.retries = 0
+        self.stopped_early = 0
+
+    def snapshot(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "cache_hits": self.cache_hits,
+            "errors": self.errors,
+            "retries": self.retries,
+            "stopped_early": self.stopped_early,
+            "latency_ms": self.latency_ms.snapshot(),
+            "first_token_ms": self.first_token_ms.snapshot(),
+            "prompt_tokens": self.prompt_tokens.snapshot(),
+            "completion_tokens": self.completion_tokens.snapshot(),
+        }
+
+
+def is_retryable(error: Exception) -> bool:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        # Connection resets and timeouts carry no status
+        return type(error).__name__ in ("APIConnectionError", "APITimeoutError", "TimeoutError", "ConnectionError")
+    return status in RETRYABLE_STATUS or status >= 500
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+_WORD = re.compile(r"\S+")
+
+
+def clip_words(text: str, max_words: int) -> Optional[str]:
+    """``text`` cut after its ``max_words``-th complete word, or None if it is within budget."""
+    for i, match in enumerate(_WORD.finditer(text)):
+        if i == max_words:
+            return text[:match.start()].rstrip()
+    return None
+
+
+class ChatStream:
+    """Iterator over the text deltas of one streamed completion.
+
+    Iterate it with ``for`` in threads or ``async for`` under the ASGI
+    server. With ``max_words`` set, the upstream stream is closed as soon
+    as the budget is reached, so the model stops generating instead of the
+    reply being cut afterwards; ``truncated`` tells the caller this
+    happened. ``text`` holds everything yielded so far.
+    """
+
+    def __init__(self, gateway: "LLMGateway", route: str, messages: List[Dict], model: str,
+                 params: Dict, max_words: Optional[int], cache_key: Optional[str]):
+        self.gateway = gateway
+        self.route = route
+        self.messages = messages
+        self.model = model
+        self.params = params
+        self.max_words = max_words
+        self.cache_key = cache_key
+        self.text = ""
+        self.truncated = False
+        self._full: List[str] = []
+        self._first: Optional[float] = None
+        self._usage = None
+
+    def _budget(self, delta: str) -> str:
+        if self.max_words is None:
+            return delta
+        clipped = clip_words(self.text + delta, self.max_words)
+        if clipped is None:
+            return delta
+        self.truncated = True
+        return clipped[len(self.text):]
+
+    def _cached(self) -> Optional[str]:
+        content = self.gateway._cached(self.gateway._stats(self.route), self.cache_key)
+        if content is None:
+            return None
+        delta = self._budget(content)
+        self.text += delta
+        return delta
+
+    def _delta(self, chunk) -> str:
+        """The budgeted text of one chunk (may be empty)."""
+        self._usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or self._usage
+        if not chunk.choices:
+            return ""
+        delta = chunk.choices[0].delta.content or ""
+        if not delta:
+            return ""
+        if self._first is None:
+            self._first = time.perf_counter()
+        self._full.append(delta)
+        delta = self._budget(delta)
+        self.text += delta
+        return delta
+
+    def _finish(self, start: float) -> None:
+        stats = self.gateway._stats(self.route)
+        self.gateway._record(stats, start, self._usage, first=self._first, truncated=self.truncated)
+        # Only complete replies are reusable
+        if self.cache_key is not None and self._full and not self.truncated:
+            self.gateway._cache_put(self.cache_key, "".join(self._full))
+
+    def __iter__(self) -> Iterator[str]:
+        cached = self._cached()
+        if cached is not None:
+            yield cached
+            return
+        start = time.perf_counter()
+        stream = self.gateway._create(self.gateway._stats(self.route), self.route, messages=self.messages,
+                                      model=self.model, stream=True, **self.params)
+        try:
+            for chunk in stream:
+                delta = self._delta(chunk)
+                if delta:
+                    yield delta
+                if self.truncated:
+                    break
+        finally:
+            # Closing the response tells the provider to stop generating
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+            self._finish(start)
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        cached = self._cached()
+        if cached is not None:
+            yield cached
+            return
+        start = time.perf_counter()
+        stream = await self.gateway._acreate(self.gateway._stats(self.route), self.route, messages=self.messages,
+                                             model=self.model, stream=True, **self.params)
+        try:
+            async for chunk in stream:
+                delta = self._delta(chunk)
+                if delta:
+                    yield delta
+                if self.truncated:
+                    break
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                await close()
+            self._finish(start)
+
+
+class LLMGateway:
+    def __init__(self, api_key: str, timeout: float = 30.0, retries: int = 3, backoff_base: float = 0.5,
+                 backoff_cap: float = 20.0, cache_size: int = 512, cache_ttl: float = 3600.0,
+                 cache_max_temperature: float = 0.3, max_connections: int = 32):
+        self.api_key = api_key
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.cache_max_temperature = cache_max_temperature
+        self.max_connections = max_connections
+        self._clients: List[Groq] = []
+        self._async_clients: List[AsyncGroq] = []
+        self._next_client = itertools.count()
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._routes: Dict[str, RouteStats] = {}
+        self._lock = threading.Lock()
+
+    def _pool_sizes(self) -> List[int]:
+        shards = -(-self.max_connections // POOL_SHARD_SIZE)
+        return [self.max_connections // shards + (i < self.max_connections % shards) for i in range(shards)]
+
+    def _limits(self, size: int):
+        import httpx
+        return httpx.Limits(max_connections=size, max_keepalive_connections=size, keepalive_expiry=60.0)
+
+    @property
+    def client(self) -> Groq:
+        """A pooled Groq client (round-robin over the pool shards), created on first use."""
+        if not self._clients:
+            with self._lock:
+                if not self._clients:
+                    self._clients = [self._make_client(size) for size in self._pool_sizes()]
+        return self._clients[next(self._next_client) % len(self._clients)]
+
+    def _make_client(self, pool_size: int) -> Groq:
+        # Retries happen here, not in the SDK, so they are counted and jittered consistently
+        kwargs = {"api_key": self.api_key, "timeout": self.timeout, "max_retries": 0}
+        try:
+            import httpx
+            kwargs["http_client"] = httpx.Client(timeout=self.timeout, limits=self._limits(pool_size))
+        except ImportError:
+            pass
+        return Groq(**kwargs)
+
+    @property
+    def async_client(self) -> AsyncGroq:
+        """A pooled AsyncGroq client for the ASGI server, created on first use."""
+        if not self._async_clients:
+            with self._lock:
+                if not self._async_clients:
+                    self._async_clients = [self._make_async_client(size) for size in self._pool_sizes()]
+        return self._async_clients[next(self._next_client) % len(self._async_clients)]
+
+    def _make_async_client(self, pool_size: int) -> AsyncGroq:
+        kwargs = {"api_key": self.api_key, "timeout": self.timeout, "max_retries": 0}
+        try:
+            import httpx
+            kwargs["http_client"] = httpx.AsyncClient(timeout=self.timeout, limits=self._limits(pool_size))
+        except ImportError:
+            pass
+        return AsyncGroq(**kwargs)
+
+    def _stats(self, route: str) -> RouteStats:
+        stats = self._routes.get(route)
+        if stats is None:
+            with self._lock:
+                stats = self._routes.setdefault(route, RouteStats())
+        return stats
+
+    @staticmethod
+    def cache_key(model: str, messages: List[Dict], params: Dict) -> str:
+        payload = json.dumps([model, messages, params], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            content, stored = entry
+            if time.time() - stored > self.cache_ttl:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return content
+
+    def _cache_put(self, key: str, content: str) -> None:
+        with self._lock:
+            self._cache[key] = (content, time.time())
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _create(self, stats: RouteStats, route: str, **request):
+        """``chat.completions.create`` with retries; for streams only opening the stream is retried."""
+        for attempt in range(self.retries + 1):
+            try:
+                return self.client.chat.completions.create(**request)
+            except Exception as e:
+                delay = self._retry_delay(stats, route, attempt, e)
+                time.sleep(delay)
+
+    async def _acreate(self, stats: RouteStats, route: str, **request):
+        """Async ``_create``: waits on the event loop instead of a thread."""
+        for attempt in range(self.retries + 1):
+            try:
+                return await self.async_client.chat.completions.create(**request)
+            except Exception as e:
+                delay = self._retry_delay(stats, route, attempt, e)
+                await asyncio.sleep(delay)
+
+    def _retry_delay(self, stats: RouteStats, route: str, attempt: int, error: Exception) -> float:
+        """Seconds to wait before retrying ``error``; re-raises it when it is final."""
+        if attempt == self.retries or not is_retryable(error):
+            with self._lock:
+                stats.calls += 1
+                stats.errors += 1
+            raise error
+        delay = _retry_after(error)
+        if delay is None:
+            delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        print(f"LLM call for {route} failed ({error}); retrying in {delay:.2f}s")
+        with self._lock:
+            stats.retries += 1
+        return delay
+
+    def _prepare(self, messages: List[Dict], model: str, temperature: float, max_tokens: Optional[int],
+                 cache: Optional[bool], params: Dict) -> Tuple[Dict, Optional[str]]:
+        """Request params and, for cacheable calls, the response cache key."""
+        params = dict(params, temperature=temperature)
+        if max_tokens is not None:
+            params["max_tokens"] = max_tokens
+        use_cache = cache if cache is not None else temperature <= self.cache_max_temperature
+        return params, self.cache_key(model, messages, params) if use_cache else None
+
+    def _cached(self, stats: RouteStats, key: Optional[str]) -> Optional[str]:
+        if key is None:
+            return None
+        content = self._cache_get(key)
+        if content is not None:
+            with self._lock:
+                stats.calls += 1
+                stats.cache_hits += 1
+        return content
+
+    def _record(self, stats: RouteStats, start: float, usage, first: Optional[float] = None,
+                truncated: bool = False) -> None:
+        with self._lock:
+            stats.calls += 1
+            stats.latency_ms.observe((time.perf_counter() - start) * 1000)
+            if first is not None:
+                stats.first_token_ms.observe((first - start) * 1000)
+            if truncated:
+                stats.stopped_early += 1
+            if usage is not None:
+                stats.prompt_tokens.observe(usage.prompt_tokens or 0)
+                stats.completion_tokens.observe(usage.completion_tokens or 0)
+
+    def _completed(self, stats: RouteStats, start: float, completion, key: Optional[str]) -> str:
+        content = completion.choices[0].message.content
+        self._record(stats, start, getattr(completion, "usage", None))
+        if key is not None and content:
+            self._cache_put(key, content)
+        return content
+
+    def chat(self, route: str, messages: List[Dict], model: str, temperature: float = 0.7,
+             max_tokens: Optional[int] = None, cache: Optional[bool] = None, **params) -> str:
+        """Run one chat completion and return the message content.
+
+        ``route`` names the caller for the histograms. Calls at or below
+        ``cache_max_temperature`` are answered from the response cache when
+        the same (model, messages, params) was seen recently; pass
+        ``cache=False`` to force a fresh call.
+        """
+        stats = self._stats(route)
+        params, key = self._prepare(messages, model, temperature, max_tokens, cache, params)
+        content = self._cached(stats, key)
+        if content is not None:
+            return content
+        start = time.perf_counter()
+        completion = self._create(stats, route, messages=messages, model=model, **params)
+        return self._completed(stats, start, completion, key)
+
+    async def achat(self, route: str, messages: List[Dict], model: str, temperature: float = 0.7,
+                    max_tokens: Optional[int] = None, cache: Optional[bool] = None, **params) -> str:
+        """``chat`` for async callers; shares the cache and route stats."""
+        stats = self._stats(route)
+        params, key = self._prepare(messages, model, temperature, max_tokens, cache, params)
+        content = self._cached(stats, key)
+        if content is not None:
+            return content
+        start = time.perf_counter()
+        completion = await self._acreate(stats, route, messages=messages, model=model, **params)
+        return self._completed(stats, start, completion, key)
+
+    def stream_chat(self, route: str, messages: List[Dict], model: str, temperature: float = 0.7,
+                    max_tokens: Optional[int] = None, max_words: Optional[int] = None,
+                    cache: Optional[bool] = None, **params) -> ChatStream:
+        """Like ``chat`` but returns a ``ChatStream`` of text deltas as they arrive.
+
+        ``max_words`` stops generation once that many words have been
+        produced. Cache hits are replayed as a single delta.
+        """
+        params.pop("stream", None)
+        params, key = self._prepare(messages, model, temperature, max_tokens, cache, params)
+        return ChatStream(self, route, messages, model, params, max_words, key)
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {route: stats.snapshot() for route, stats in sorted(self._routes.items())}
+
+
+_gateways: Dict[str, LLMGateway] = {}
+_gateways_lock = threading.Lock()
+
+
+def get_gateway(api_key: Optional[str] = None) -> LLMGateway:
+    """Process-wide gateway for an API key (GROQ_API_KEY by default)."""
+    api_key = api_key or os.environ.get("GROQ_API_KEY")
+    if not api_key:
+        raise ValueError("Groq API key must be provided in the GROQ_API_KEY environment variable.")
+    with _gateways_lock:
+        gateway = _gateways.get(api_key)
+        if gateway is None:
+            gateway = _gateways[api_key] = LLMGateway(
+                api_key,
+                timeout=float(os.environ.get("LLM_TIMEOUT_SECONDS", 30)),
+                retries=int(os.environ.get("LLM_RETRIES", 3)),
+                cache_size=int(os.environ.get("LLM_CACHE_SIZE", 512)),
+                cache_ttl=float(os.environ.get("LLM_CACHE_TTL_SECONDS", 3600)),
+                cache_max_temperature=float(os.environ.get("LLM_CACHE_MAX_TEMPERATURE", 0.3)),
+                max_connections=int(os.environ.get("LLM_MAX_CONNECTIONS", 32)),
+            )
+        return gateway
@@ -0,0 +1,262 @@
+"""Requests/sec and memory per concurrent request: Flask app.run vs the ASGI mode.
+
+Both servers talk to a local mock of the Groq API that answers every
+completion after a fixed delay, so the comparison measures how many LLM
+waits a server process can hold rather than provider speed or quota.
+Run from ``backend/`` (needs uvicorn and Linux /proc for memory):
+
+    python loadtest.py
+    python loadtest.py --concurrency 10 100 500 1000 --latency-ms 800 --output report.md
+
+Each level runs ``--duration`` seconds of closed-loop POST /chat with
+messages the intent router does not answer, so every request reaches the
+(mock) LLM.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+import httpx
+import numpy as np
+
+BACKEND = Path(__file__).resolve().parent
+MOCK_REPLY = json.dumps({"intent": "greeting", "response": "Here is a short joke for you.", "action": "none"})
+
+
+def _completion_body() -> bytes:
+    return json.dumps({
+        "id": "mock", "object": "chat.completion", "created": int(time.time()), "model": "mock",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": MOCK_REPLY}}],
+        "usage": {"prompt_tokens": 120, "completion_tokens": 20, "total_tokens": 140},
+    }).encode()
+
+
+async def _read_message(reader: asyncio.StreamReader) -> Tuple[bytes, bytes]:
+    """One HTTP/1.1 message (head, body) using Content-Length framing."""
+    head = await reader.readuntil(b"\r\n\r\n")
+    length = 0
+    for line in head.split(b"\r\n"):
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":", 1)[1])
+    return head, await reader.readexactly(length) if length else b""
+
+
+async def serve_mock(port: int, latency_s: float) -> None:
+    """Minimal keep-alive HTTP server mimicking POST /openai/v1/chat/completions.
+
+    Plain asyncio rather than an ASGI server so the mock costs as little
+    CPU as possible next to the server under test.
+    """
+    body = _completion_body()
+    response = (b"HTTP/1.1 200 OK\r\ncontent-type: application/json\r\ncontent-length: "
+                + str(len(body)).encode() + b"\r\n\r\n" + body)
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                await _read_message(reader)
+                await asyncio.sleep(latency_s)
+                writer.write(response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", port, backlog=4096)
+    async with server:
+        await server.serve_forever()
+
+
+def _process_tree(pid: int) -> Set[int]:
+    """``pid`` and its descendants (uvicorn workers), from /proc."""
+    parents: Dict[int, int] = {}
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            fields = stat.read_text().rsplit(")", 1)[1].split()
+            parents[int(stat.parent.name)] = int(fields[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    tree, frontier = {pid}, [pid]
+    while frontier:
+        parent = frontier.pop()
+        children = [child for child, ppid in parents.items() if ppid == parent and child not in tree]
+        tree.update(children)
+        frontier.extend(children)
+    return tree
+
+
+def sample(pid: int) -> Dict[str, float]:
+    """Resident memory (MB) and thread count summed over the server's processes."""
+    rss_kb = threads = 0
+    for p in _process_tree(pid):
+        try:
+            for line in Path(f"/proc/{p}/status").read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    rss_kb += int(line.split()[1])
+                elif line.startswith("Threads:"):
+                    threads += int(line.split()[1])
+        except OSError:
+            continue
+    return {"rss_mb": rss_kb / 1024, "threads": threads}
+
+
+def start_server(kind: str, port: int, env: Dict[str, str], workers: int) -> subprocess.Popen:
+    if kind == "flask":
+        # The current setup: Flask's built-in threaded server
+        cmd = [sys.executable, "-c", f"import app; app.app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "asgi:app", "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(workers), "--log-level", "warning", "--no-access-log"]
+    return subprocess.Popen(cmd, cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_ready(url: str, timeout: float = 60.0, method: str = "GET") -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.request(method, url, timeout=5.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+async def load(port: int, pid: int, concurrency: int, duration: float) -> Dict:
+    """Closed loop: each of ``concurrency`` keep-alive connections sends its next request when the last returns."""
+    latencies: List[float] = []
+    errors = 0
+    peak = {"rss_mb": 0.0, "threads": 0}
+    stop = time.monotonic() + duration
+
+    async def worker(n: int):
+        nonlocal errors
+        reader = writer = None
+        i = 0
+        while time.monotonic() < stop:
+            body = json.dumps({"message": f"tell me something interesting {n}-{i}"}).encode()
+            request = (b"POST /chat HTTP/1.1\r\nhost: 127.0.0.1\r\ncontent-type: application/json\r\n"
+                       b"content-length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+            start = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(request)
+                head, _ = await _read_message(reader)
+                if head.startswith(b"HTTP/1.1 200") or head.startswith(b"HTTP/1.0 200"):
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+                if b"connection: close" in head.lower() or head.startswith(b"HTTP/1.0"):
+                    writer.close()
+                    writer = None
+            except (OSError, asyncio.IncompleteReadError):
+                errors += 1
+                if writer is not None:
+                    writer.close()
+                writer = None
+            i += 1
+        if writer is not None:
+            writer.close()
+
+    async def monitor():
+        while time.monotonic() < stop:
+            s = await asyncio.to_thread(sample, pid)
+            peak["rss_mb"] = max(peak["rss_mb"], s["rss_mb"])
+            peak["threads"] = max(peak["threads"], s["threads"])
+            await asyncio.sleep(0.25)
+
+    started = time.perf_counter()
+    await asyncio.gather(monitor(), *(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)) * 1000 if latencies else float("nan"),
+        "p95_ms": float(np.percentile(latencies, 95)) * 1000 if latencies else float("nan"),
+        "errors": errors,
+        "peak_rss_mb": peak["rss_mb"],
+        "peak_threads": peak["threads"],
+    }
+
+
+def run(args) -> List[Dict]:
+    mock_port, server_port = args.port, args.port + 1
+    mock = subprocess.Popen(
+        [sys.executable, __file__, "--serve-mock", "--port", str(mock_port), "--latency-ms", str(args.latency_ms)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    rows = []
+    try:
+        wait_ready(f"http://127.0.0.1:{mock_port}/", method="POST")
+        env = dict(os.environ,
+                   GROQ_API_KEY="loadtest",
+                   GROQ_BASE_URL=f"http://127.0.0.1:{mock_port}",
+                   # The client pool would otherwise cap in-flight calls for both servers
+                   LLM_MAX_CONNECTIONS=str(max(args.concurrency) + 16),
+                   LLM_RETRIES="0")
+        for kind in args.servers:
+            server = start_server(kind, server_port, env, args.workers)
+            try:
+                wait_ready(f"http://127.0.0.1:{server_port}/llm-stats")
+                idle = sample(server.pid)
+                for concurrency in args.concurrency:
+                    result = asyncio.run(load(server_port, server.pid, concurrency, args.duration))
+                    result.update(server=kind, concurrency=concurrency, idle_rss_mb=idle["rss_mb"],
+                                  kb_per_request=(result["peak_rss_mb"] - idle["rss_mb"]) * 1024 / concurrency)
+                    rows.append(result)
+                    print(f"{kind} c={concurrency}: {result['rps']:.1f} req/s, {result['errors']} errors", file=sys.stderr)
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+    finally:
+        mock.terminate()
+        mock.wait(timeout=30)
+    return rows
+
+
+def format_report(rows: List[Dict], args) -> str:
+    lines = [
+        f"Mock LLM latency {args.latency_ms} ms, {args.duration:.0f} s per level, "
+        f"ASGI workers: {args.workers}\n",
+        "| server | concurrency | req/s | p50 ms | p95 ms | errors | idle RSS MB | peak RSS MB | KB / in-flight request | peak threads |",
+        "|---|---|---|---|---|---|---|---|---|---|",
+    ]
+    for r in rows:
+        lines.append(f"| {r['server']} | {r['concurrency']} | {r['rps']:.1f} | {r['p50_ms']:.0f} | {r['p95_ms']:.0f} | "
+                     f"{r['errors']} | {r['idle_rss_mb']:.0f} | {r['peak_rss_mb']:.0f} | {r['kb_per_request']:.0f} | "
+                     f"{r['peak_threads']} |")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--servers", nargs="+", default=["flask", "asgi"], choices=["flask", "asgi"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[10, 100, 500])
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per concurrency level")
+    parser.add_argument("--latency-ms", type=int, default=800, help="Mock completion latency")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--port", type=int, default=9100, help="Mock upstream port; the server uses port + 1")
+    parser.add_argument("--output", help="Also write the markdown table to this file")
+    parser.add_argument("--serve-mock", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_mock:
+        asyncio.run(serve_mock(args.port, args.latency_ms / 1000))
+        return
+
+    report = format_report(run(args), args)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
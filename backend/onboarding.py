@@ -0,0 +1,237 @@
+"""Deterministic registration flow for /onboarding and /process-voice.
+
+Spoken numbers (English, Hindi, Telugu and Tamil digit words, native
+digits, "double five") are normalized to digits and each step is
+validated in code. Replies use the same JSON shapes as the LLM prompts;
+input the flow cannot parse returns None so the caller can fall back to
+the LLM.
+"""
+import os
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+STEPS = ("language", "phone", "otp", "upiPin", "complete")
+NEXT_STEP = {step: STEPS[i + 1] for i, step in enumerate(STEPS[:-1])}
+
+LANGUAGES = {
+    "english": ("english", "angrezi", "अंग्रेज़ी", "अंग्रेजी", "ఇంగ్లీష్", "ஆங்கிலம்"),
+    "hindi": ("hindi", "हिंदी", "हिन्दी", "హిందీ", "இந்தி"),
+    "telugu": ("telugu", "तेलुगु", "తెలుగు", "தெலுங்கு"),
+    "tamil": ("tamil", "तमिल", "తమిళం", "தமிழ்"),
+}
+
+DIGIT_WORDS = {
+    # English
+    "zero": "0", "oh": "0", "o": "0", "one": "1", "two": "2", "three": "3", "four": "4",
+    "five": "5", "six": "6", "seven": "7", "eight": "8", "nine": "9",
+    # Hindi (romanized and Devanagari)
+    "shunya": "0", "sunya": "0", "ek": "1", "do": "2", "teen": "3", "tin": "3", "char": "4", "chaar": "4",
+    "paanch": "5", "panch": "5", "chhe": "6", "chah": "6", "chheh": "6", "saat": "7", "sat": "7",
+    "aath": "8", "ath": "8", "nau": "9", "nou": "9",
+    "शून्य": "0", "एक": "1", "दो": "2", "तीन": "3", "चार": "4", "पांच": "5", "पाँच": "5",
+    "छह": "6", "छः": "6", "छे": "6", "सात": "7", "आठ": "8", "नौ": "9",
+    # Telugu (romanized and Telugu script)
+    "sunna": "0", "okati": "1", "okkati": "1", "rendu": "2", "moodu": "3", "mudu": "3", "nalugu": "4",
+    "naalugu": "4", "aidu": "5", "ayidu": "5", "aaru": "6", "edu": "7", "yedu": "7", "enimidi": "8",
+    "tommidi": "9", "thommidi": "9",
+    "సున్నా": "0", "ఒకటి": "1", "రెండు": "2", "మూడు": "3", "నాలుగు": "4", "ఐదు": "5",
+    "ఆరు": "6", "ఏడు": "7", "ఎనిమిది": "8", "తొమ్మిది": "9",
+    # Tamil (romanized and Tamil script)
+    "poojiyam": "0", "pujyam": "0", "onru": "1", "ondru": "1", "onnu": "1", "irandu": "2", "randu": "2",
+    "moonru": "3", "moondru": "3", "moonu": "3", "naangu": "4", "naalu": "4", "ainthu": "5", "anju": "5",
+    "ezhu": "7", "ettu": "8", "onbathu": "9", "ombathu": "9",
+    "பூஜ்ஜியம்": "0", "ஒன்று": "1", "இரண்டு": "2", "மூன்று": "3", "நான்கு": "4", "ஐந்து": "5",
+    "ஆறு": "6", "ஏழு": "7", "எட்டு": "8", "ஒன்பது": "9",
+}
+
+REPEAT_WORDS = {"double": 2, "dubble": 2, "triple": 3, "tripple": 3}
+
+YES_WORDS = {"yes", "yeah", "yep", "correct", "right", "ok", "okay", "confirm", "haan", "han", "ha", "ji",
+             "हाँ", "हां", "avunu", "aunu", "అవును", "aam", "aama", "ஆமாம்", "ஆம்"}
+NO_WORDS = {"no", "nope", "wrong", "incorrect", "nahi", "nahin", "नहीं", "kaadu", "kadu", "కాదు",
+            "illai", "illa", "இல்லை"}
+
+# Words that often surround a spoken number and should not count against it
+FILLER_WORDS = {"my", "number", "is", "the", "it's", "its", "phone", "mobile", "otp", "pin", "upi", "code",
+                "and", "mera", "meri", "hai", "please", "plus"}
+
+PROMPTS = {
+    "language": "Which language would you like to use: English, Hindi, Telugu or Tamil?",
+    "phone": "What is your 10-digit mobile number?",
+    "otp": "What is the OTP sent to your phone?",
+    "upiPin": "Choose a 6-digit UPI PIN.",
+    "complete": "Registration is complete. Welcome to Finsee!",
+}
+
+_TOKEN = re.compile(r"[^\s,.\-!?]+")
+
+
+def _token_digits(token: str) -> Optional[str]:
+    if token.isdigit():
+        # Covers Devanagari, Telugu and Tamil digits as well as ASCII
+        return "".join(str(unicodedata.digit(ch)) for ch in token)
+    return DIGIT_WORDS.get(token)
+
+
+def parse_spoken_number(text: str) -> Tuple[str, int, int]:
+    """Digits spoken in ``text`` plus counts of numeric and other words.
+
+    "nine eight double seven" -> ("9877", 4, 0). Unknown words are skipped
+    so "my number is 98765 43210" still parses.
+    """
+    digits: List[str] = []
+    numeric = other = 0
+    repeat = 1
+    for token in _TOKEN.findall(text.lower()):
+        if token in REPEAT_WORDS:
+            repeat = REPEAT_WORDS[token]
+            numeric += 1
+            continue
+        value = _token_digits(token)
+        if value is None:
+            if token not in FILLER_WORDS:
+                other += 1
+            repeat = 1
+            continue
+        # "double five" repeats a single digit; "double 55" is taken literally
+        digits.append(value * repeat if len(value) == 1 else value)
+        numeric += 1
+        repeat = 1
+    return "".join(digits), numeric, other
+
+
+def detect_language(text: str) -> Optional[str]:
+    text = text.lower()
+    return next((lang for lang, names in LANGUAGES.items() if any(name in text for name in names)), None)
+
+
+def _answer(text: str) -> Optional[bool]:
+    tokens = _TOKEN.findall(text.lower())
+    if not tokens or len(tokens) > 3:
+        return None
+    if any(token in NO_WORDS for token in tokens):
+        return False
+    if any(token in YES_WORDS for token in tokens):
+        return True
+    return None
+
+
+def _spoken(digits: str) -> str:
+    # Read numbers back digit by digit so TTS does not say "nine billion..."
+    return " ".join(digits)
+
+
+class OnboardingFlow:
+    def __init__(self, test_otp: str = "1111"):
+        self.test_otp = test_otp
+        self.stats = {"local": 0, "fallback": 0}
+
+    @classmethod
+    def from_env(cls) -> "OnboardingFlow":
+        return cls(test_otp=os.environ.get("ONBOARDING_TEST_OTP", "1111"))
+
+    def validate(self, step: str, digits: str) -> Tuple[Optional[str], Optional[str]]:
+        """Return (value, None) when ``digits`` (a language name for that step) is valid, else (None, error message)."""
+        if step == "language":
+            language = digits.lower()
+            if language not in LANGUAGES:
+                return None, "I did not catch the language."
+            return language, None
+        if step == "phone":
+            # Accept a spoken country code or trunk zero in front of the number
+            if len(digits) == 12 and digits.startswith("91"):
+                digits = digits[2:]
+            elif len(digits) == 11 and digits.startswith("0"):
+                digits = digits[1:]
+            if len(digits) != 10:
+                return None, f"I got {len(digits)} digits. A mobile number has 10 digits."
+            return digits, None
+        if step == "otp":
+            if digits != self.test_otp:
+                return None, "That OTP is not correct."
+            return digits, None
+        if step == "upiPin":
+            if len(digits) != 6:
+                return None, f"I got {len(digits)} digits. Your UPI PIN must be 6 digits."
+            return digits, None
+        return None, None
+
+    def _parse(self, step: str, text: str) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        digits, numeric, other = parse_spoken_number(text)
+        if not digits or other > numeric:
+            # Mostly words: not something this flow can read reliably
+            return None
+        return self.validate(step, digits)
+
+    def _local(self, reply: Dict) -> Dict:
+        self.stats["local"] += 1
+        return reply
+
+    def _fallback(self) -> None:
+        self.stats["fallback"] += 1
+        return None
+
+    def text_reply(self, step: str, user_input: str) -> Optional[Dict]:
+        """/onboarding reply: {"step", "value", "message", "status"}, or None to ask the LLM."""
+        if step not in NEXT_STEP or step == "language":
+            return self._fallback()
+        parsed = self._parse(step, user_input)
+        if parsed is None:
+            return self._fallback()
+        value, error = parsed
+        if error:
+            return self._local({"step": step, "value": "", "message": f"{error} {PROMPTS[step]}", "status": "error"})
+        next_step = NEXT_STEP[step]
+        return self._local({"step": next_step, "value": value, "message": PROMPTS[next_step], "status": "success"})
+
+    def voice_reply(self, step: str, transcript: str, form_data: Dict) -> Optional[Dict]:
+        """/process-voice reply in the VOICE_ONBOARDING_PROMPT shape, or None to ask the LLM."""
+        if step not in NEXT_STEP:
+            return self._fallback()
+
+        # "yes"/"no" confirming the value the client already holds for this step.
+        # The client's copy is re-validated: confirming must not skip the checks.
+        answer = _answer(transcript)
+        pending = str(form_data.get(step) or "")
+        if answer is not None and pending:
+            value, error = self.validate(step, pending) if answer else (None, None)
+            if answer and not error:
+                next_step = NEXT_STEP[step]
+                return self._local(self._voice(step, next_step, value, "high", False,
+                                               f"Confirmed. {PROMPTS[next_step]}", PROMPTS[next_step]))
+            message = f"{error} {PROMPTS[step]}" if error else f"Okay, let's try again. {PROMPTS[step]}"
+            return self._local(self._voice(step, step, "", "high", False, message, PROMPTS[step]))
+
+        if step == "language":
+            language = detect_language(transcript)
+            if language is None:
+                return self._fallback()
+            return self._local(self._voice(step, step, language, "high", True,
+                                           f"I heard you want to use {language}. Is that correct?",
+                                           "Say yes to confirm or no to try again"))
+
+        parsed = self._parse(step, transcript)
+        if parsed is None:
+            return self._fallback()
+        value, error = parsed
+        if error:
+            return self._local(self._voice(step, step, "", "low", False, f"{error} {PROMPTS[step]}", PROMPTS[step]))
+        # Never read a PIN or OTP back aloud
+        heard = f"your number as {_spoken(value)}" if step == "phone" else (
+            "the OTP" if step == "otp" else "a 6-digit PIN")
+        return self._local(self._voice(step, step, value, "high", True, f"I heard {heard}. Is that correct?",
+                                       "Say yes to confirm or no to try again"))
+
+    @staticmethod
+    def _voice(current: str, step: str, value: str, confidence: str, needs_confirmation: bool, message: str,
+               next_instruction: str) -> Dict:
+        return {
+            "intent": "language_selection" if current == "language" else "registration",
+            "step": step,
+            "value": value,
+            "confidence": confidence,
+            "needs_confirmation": needs_confirmation,
+            "message": message,
+            "next_instruction": next_instruction,
+        }
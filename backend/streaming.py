@@ -0,0 +1,156 @@
+"""Server-sent event helpers for streamed LLM replies.
+
+Replies are sent as ``token`` events as deltas arrive, ``sentence``
+events whenever a sentence is complete (so TTS can start speaking on the
+first one), and a final ``done`` event carrying the same payload the
+non-streaming endpoint returns. Failures after the stream has started
+are reported as an ``error`` event.
+"""
+import json
+import re
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_SENTENCE_END = re.compile(r"[.!?।](?=\s)|\n")
+
+
+def sse(data, event: Optional[str] = None) -> str:
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def wants_stream(payload: Dict, accept: str = "") -> bool:
+    """Streaming is opt-in: ``"stream": true`` in the body or an SSE Accept header."""
+    return bool(payload.get("stream")) or "text/event-stream" in (accept or "")
+
+
+class JsonFieldStream:
+    """Incrementally decodes one string field of a JSON object being streamed.
+
+    ``feed`` takes raw deltas of e.g. ``{"intent": "balance", "response": "Your bal``
+    and returns only the newly decoded characters of ``response``.
+    """
+
+    def __init__(self, field: str):
+        self._key = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buffer = ""
+        self._pos = 0
+        self._state = "seek"
+
+    def feed(self, delta: str) -> str:
+        self._buffer += delta
+        if self._state == "seek":
+            match = self._key.search(self._buffer)
+            if match is None:
+                return ""
+            self._pos = match.end()
+            self._state = "value"
+        if self._state != "value":
+            return ""
+
+        out: List[str] = []
+        buffer, pos = self._buffer, self._pos
+        while pos < len(buffer):
+            ch = buffer[pos]
+            if ch == '"':
+                self._state = "done"
+                pos += 1
+                break
+            if ch != "\\":
+                out.append(ch)
+                pos += 1
+                continue
+            # Escapes may be split across deltas; wait for the rest
+            if pos + 1 >= len(buffer):
+                break
+            code = buffer[pos + 1]
+            if code == "u":
+                if pos + 6 > len(buffer):
+                    break
+                out.append(chr(int(buffer[pos + 2:pos + 6], 16)))
+                pos += 6
+            else:
+                out.append(_ESCAPES.get(code, code))
+                pos += 2
+        self._pos = pos
+        return "".join(out)
+
+
+class SentenceSplitter:
+    """Collects streamed text and hands back complete sentences."""
+
+    def __init__(self):
+        self._pending = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._pending += text
+        sentences = []
+        while True:
+            match = _SENTENCE_END.search(self._pending)
+            if match is None:
+                break
+            sentence, self._pending = self._pending[:match.end()].strip(), self._pending[match.end():]
+            if sentence:
+                sentences.append(sentence)
+        return sentences
+
+    def flush(self) -> List[str]:
+        sentence, self._pending = self._pending.strip(), ""
+        return [sentence] if sentence else []
+
+
+class _ReplyEvents:
+    """Turns deltas into token/sentence events; shared by the sync and async generators."""
+
+    def __init__(self, field: Optional[str]):
+        self.extractor = JsonFieldStream(field) if field else None
+        self.sentences = SentenceSplitter()
+        self.raw: List[str] = []
+
+    def feed(self, delta: str) -> List[str]:
+        self.raw.append(delta)
+        text = self.extractor.feed(delta) if self.extractor else delta
+        if not text:
+            return []
+        return [sse({"text": text}, "token")] + [sse({"text": s}, "sentence") for s in self.sentences.feed(text)]
+
+    def finish(self, done: Callable[[str], Dict]) -> List[str]:
+        events = [sse({"text": s}, "sentence") for s in self.sentences.flush()]
+        return events + [sse(done("".join(self.raw)), "done")]
+
+
+def _error(e: Exception) -> str:
+    print(f"Streaming error: {e}")
+    return sse({"status": "error", "message": str(e)}, "error")
+
+
+def text_events(deltas: Iterable[str], done: Callable[[str], Dict],
+                field: Optional[str] = None) -> Iterator[str]:
+    """SSE messages for a streamed reply.
+
+    ``field`` names the JSON string field to speak when the model replies
+    in JSON; ``done`` builds the final payload from the complete raw text.
+    """
+    reply = _ReplyEvents(field)
+    try:
+        for delta in deltas:
+            yield from reply.feed(delta)
+        yield from reply.finish(done)
+    except Exception as e:
+        yield _error(e)
+
+
+async def atext_events(deltas: AsyncIterable[str], done: Callable[[str], Dict],
+                       field: Optional[str] = None) -> AsyncIterator[str]:
+    """``text_events`` over an async stream, for the ASGI server."""
+    reply = _ReplyEvents(field)
+    try:
+        async for delta in deltas:
+            for event in reply.feed(delta):
+                yield event
+        for event in reply.finish(done):
+            yield event
+    except Exception as e:
+        yield _error(e)